@@ -0,0 +1,136 @@
+from SysjSignal import OutputSignal, InputSignal
+
+
+class Station:
+    """ The signals of one controller CD, and the simulation sequences its signals trigger """
+
+    def __init__(self, key: str, oSig: list[OutputSignal], iSig: list[InputSignal],
+                 sequence: tuple[str, dict] | None = None, trigger: InputSignal | None = None):
+        self.key = key
+        self.oSig = oSig
+        self.iSig = iSig
+        # the sequence run by the station's process switch and by the received trigger signal
+        self.sequence = sequence
+        self.trigger = trigger
+
+    def getSimulatorEvent(self, simulate) -> list | None:
+        """ The switch of the first socket-less output signal runs the station's sequence """
+        if self.sequence is None:
+            return None
+
+        name, params = self.sequence
+
+        def stationSimu(signals: list[OutputSignal]):
+            simulate(name, **params)
+
+        processIdx = self.getProcessIndex()
+        return [(stationSimu, self.oSig) if i == processIdx else None for i in range(len(self.oSig))]
+
+    def getProcessIndex(self) -> int | None:
+        for i, signal in enumerate(self.oSig):
+            if signal.ignoreSocket:
+                return i
+        return None
+
+
+def createRotaryStation() -> Station:
+    oSig = [
+        OutputSignal("tableAlignedWithSensor", "RotaryTableControllerCD", 40001, initStatus=True),
+        OutputSignal("bottleAtPos5", "RotaryTableControllerCD", 40001),
+        OutputSignal("capOnBottleAtPos1", "RotaryTableControllerCD", 40001),
+        OutputSignal("move2NextPos", "RotaryTableControllerCD", 40001, oneShot=True, ignoreSocket=True),
+    ]
+
+    iSig = [
+        InputSignal("rotaryTableTrigger", "RotaryTableModel", 41001),
+        InputSignal("rotaryIdle", "Coordinator", 41001),
+    ]
+
+    return Station('rotaryTable', oSig, iSig, sequence=('rotary', {}), trigger=iSig[0])
+
+
+def createConveyorStation() -> Station:
+    oSig = [
+        OutputSignal("bottleAtPos1", "ConveyorControllerCD", 40000),
+        OutputSignal("bottleLeftPos5", "ConveyorControllerCD", 40000),
+    ]
+    iSig = [
+        InputSignal("motConveyorOnOff", "ConveyorModel", 41000),
+    ]
+
+    return Station('conveyor', oSig, iSig)
+
+
+def createFillerStation(fillerIdx: str, iPort, oPort) -> Station:
+    iSig = [
+        InputSignal(f"valveInjector{fillerIdx}OnOff", "FillerModel", iPort),
+        InputSignal(f"valveInlet{fillerIdx}OnOff", "FillerModel", iPort),
+        InputSignal(f"dosUnit{fillerIdx}ValveRetract", "FillerModel", iPort),
+        InputSignal(f"dosUnit{fillerIdx}ValveExtend", "FillerModel", iPort),
+        InputSignal(f"filler{fillerIdx}Idle", "Coordinator", iPort),
+    ]
+
+    oSig = [
+        OutputSignal(f"bottleAtPos2{fillerIdx}", f"Filler{fillerIdx}ControllerCD", oPort),
+        OutputSignal(f"dosUnit{fillerIdx}Evac", f"Filler{fillerIdx}ControllerCD", oPort, initStatus=True),
+        OutputSignal(f"dosUnit{fillerIdx}AtTarget", f"Filler{fillerIdx}ControllerCD", oPort),
+        OutputSignal(f"bottleAtPos2{fillerIdx}Full", f"Filler{fillerIdx}ControllerCD", oPort),
+        OutputSignal(f"filler{fillerIdx}DoProcess", f"Filler{fillerIdx}ControllerCD", oPort,
+                     oneShot=True, ignoreSocket=True),
+    ]
+
+    return Station(f'filler{fillerIdx}', oSig, iSig, sequence=('filler', {'idx': fillerIdx}))
+
+
+def createCapperStation() -> Station:
+    oSig = [
+        OutputSignal("bottleAtPos4", "CapperControllerCD", 40006),
+        OutputSignal("gripperZAxisLowered", "CapperControllerCD", 40006),
+        OutputSignal("gripperZAxisLifted", "CapperControllerCD", 40006, initStatus=True),
+        OutputSignal("gripperTurnHomePos", "CapperControllerCD", 40006, initStatus=True),
+        OutputSignal("gripperTurnFinalPos", "CapperControllerCD", 40006),
+        OutputSignal("capperDoProcess", "CapperControllerCD", 40006, oneShot=True, ignoreSocket=True),
+    ]
+
+    iSig = [
+        InputSignal("cylPos5ZaxisExtend", "CapperModel", 41006),
+        InputSignal("gripperTurnRetract", "CapperModel", 41006),
+        InputSignal("gripperTurnExtend", "CapperModel", 41006),
+        InputSignal("capGripperPos5Extend", "CapperModel", 41006),
+        InputSignal("cylClampBottleExtend", "CapperModel", 41006),
+        InputSignal("capperIdle", "Coordinator", 41006),
+    ]
+
+    return Station('capper', oSig, iSig, sequence=('capper', {}))
+
+
+def createLineStations() -> dict[str, Station]:
+    """ Every station of the line keyed like allOutputSignal, with the SysJ ports they talk on """
+    stations = [
+        createRotaryStation(),
+        createConveyorStation(),
+        createFillerStation('A', 41002, 40002),
+        createFillerStation('B', 41003, 40003),
+        createFillerStation('C', 41004, 40004),
+        createFillerStation('D', 41005, 40005),
+        createCapperStation(),
+    ]
+    return {station.key: station for station in stations}
+
+
+def createPosSignals() -> tuple[OutputSignal, InputSignal]:
+    """ The orders sent to the POS controller and the bottle progress it reports back """
+    return OutputSignal("POS", "POS", 50000, oneShot=True), InputSignal("POS", "POS", 51000)
+
+
+def getBottlePosSignals(stations: dict[str, Station]) -> list[OutputSignal]:
+    """ The sensors from POS1 to POS5 that see a bottle on the table """
+    return [
+        stations['conveyor'].oSig[0],
+        stations['fillerA'].oSig[0],
+        stations['fillerB'].oSig[0],
+        stations['fillerC'].oSig[0],
+        stations['fillerD'].oSig[0],
+        stations['capper'].oSig[0],
+        stations['conveyor'].oSig[1],
+    ]
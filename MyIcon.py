@@ -1,5 +1,8 @@
 from enum import Enum
 
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import QApplication
 from qfluentwidgets import Theme, FluentIconBase
 
 
@@ -14,3 +17,18 @@ class MyFluentIcon(FluentIconBase, Enum):
     def path(self, theme=Theme.AUTO):
         # getIconColor() 根据主题返回字符串 "white" 或者 "black"
         return f'./res/icons/{self.value[0]}.svg'
+
+
+class IconCache:
+    """ Process wide icons pre-rendered to a pixmap, so painting never touches the svg again """
+
+    icons: dict[tuple[FluentIconBase, int, int, float], QIcon] = {}
+
+    @classmethod
+    def get(cls, icon: FluentIconBase, width: int, height: int) -> QIcon:
+        ratio = QApplication.primaryScreen().devicePixelRatio() if QApplication.primaryScreen() else 1.0
+        key = (icon, width, height, ratio)
+        cached = cls.icons.get(key)
+        if cached is None:
+            cached = cls.icons[key] = QIcon(icon.icon().pixmap(QSize(width, height), ratio))
+        return cached
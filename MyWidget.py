@@ -1,14 +1,14 @@
 # coding:utf-8
 
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Signal, QAbstractListModel, QModelIndex
 from PySide6.QtGui import Qt
-from PySide6.QtWidgets import QFrame, QHBoxLayout, QVBoxLayout, QWidget, QLabel, QListWidgetItem, QSizePolicy
+from PySide6.QtWidgets import QFrame, QHBoxLayout, QVBoxLayout, QWidget, QLabel, QSizePolicy
 from qfluentwidgets import (SubtitleLabel, setFont, IconWidget,
-                            SwitchButton, PushButton, LineEdit, DoubleSpinBox, ListWidget, CheckBox, ComboBox,
+                            SwitchButton, PushButton, LineEdit, DoubleSpinBox, ListView, CheckBox, ComboBox,
                             CompactSpinBox, ProgressRing)
 
-from MyIcon import MyFluentIcon as MIF
-from OrderPOS import Order, OrderRecipe, OrderStatus, OrderDao, UpdateOrderDto
+from MyIcon import MyFluentIcon as MIF, IconCache
+from OrderPOS import Order, OrderRecipe, OrderStatus, UpdateOrderDto, createOrderDao
 from SysjSignal import InputSignal, OutputSignal
 
 
@@ -48,18 +48,21 @@ class LabelStatusLight(QWidget):
         self.layout = QHBoxLayout(self)
 
         self.label = QLabel(inputSignal.name)
+        self.status = False
         self.statusLight = IconWidget()
-        self.statusLight.setIcon(MIF.SL_GREY)
+        self.statusLight.setIcon(IconCache.get(MIF.SL_GREY, 32, 32))
         self.statusLight.setFixedSize(32, 32)
 
         self.layout.addWidget(self.statusLight)
         self.layout.addWidget(self.label)
 
     def setStatus(self, status):
-        if status:
-            self.statusLight.setIcon(MIF.SL_GREEN)
-        else:
-            self.statusLight.setIcon(MIF.SL_GREY)
+        status = bool(status)
+        if status == self.status:
+            return
+
+        self.status = status
+        self.statusLight.setIcon(IconCache.get(MIF.SL_GREEN if status else MIF.SL_GREY, 32, 32))
 
 
 class RecipeCard(QWidget):
@@ -311,24 +314,72 @@ class Widget(QFrame):
         self.vBoxLayout.addSpacing(100)
 
 
+class OrderListModel(QAbstractListModel):
+    """ The orders of an order store as rows. Nothing is copied, an order is only read when its row is shown """
+    OrderIdRole = Qt.ItemDataRole.UserRole + 1
+    OrderRole = Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, orderDao, parent=None):
+        super().__init__(parent)
+        self.orderDao = orderDao
+        # rows the view knows of, the store has already grown when sigOrderAdded arrives
+        self.count = orderDao.getOrderCount()
+
+        orderDao.sigMngr.sigOrderAdded.connect(self.insertOrderRow)
+        orderDao.sigMngr.sigOrderUpdated.connect(self.updateOrderRow)
+        orderDao.sigMngr.sigOrdersCleared.connect(self.clearOrderRows)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self.count:
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self.orderDao.getOrderIdAt(index.row()))
+        if role == self.OrderIdRole:
+            return self.orderDao.getOrderIdAt(index.row())
+        if role == self.OrderRole:
+            return self.orderDao.getOrderAt(index.row())
+        if role == Qt.ItemDataRole.ToolTipRole:
+            order = self.orderDao.getOrderAt(index.row())
+            return f"{order.name}  {order.producedAmount}/{order.count}  {order.orderStatus}"
+        return None
+
+    def insertOrderRow(self, row: int):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.count += 1
+        self.endInsertRows()
+
+    def updateOrderRow(self, row: int):
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index)
+
+    def clearOrderRows(self):
+        self.beginResetModel()
+        self.count = 0
+        self.endResetModel()
+
+
 class PosWidget(QFrame):
     def __init__(self, parent=None):
         super().__init__(parent=parent)
-        self.orderDao = OrderDao()
-        self.orderDao.sigMngr.sigOrderListChanged.connect(lambda: self.updateViewList())
+        self.orderDao = createOrderDao()
 
         self.hBoxLayoutMain = QHBoxLayout(self)
 
-        self.orderListView = ListWidget()
-
-        for oneItem in self.orderDao.getOrderIdList():
-            self.orderListView.addItem(str(oneItem))
+        self.orderListModel = OrderListModel(self.orderDao, self)
+        self.orderListView = ListView()
+        # rows are laid out from the first one only, not measured one by one
+        self.orderListView.setUniformItemSizes(True)
+        self.orderListView.setModel(self.orderListModel)
 
-        self.orderListView.setCurrentIndex(self.orderListView.model().index(0, 0))
-        self.orderListView.itemClicked.connect(lambda item: self.updateOrderCard(item))
+        self.orderListView.setCurrentIndex(self.orderListModel.index(0, 0))
+        self.orderListView.clicked.connect(lambda index: self.updateOrderCard(index))
 
-        if len(self.orderDao.getOrderList()) > 0:
-            self.orderCard = OrderCard(self.orderDao.getOrderList()[0])
+        if self.orderDao.getOrderCount() > 0:
+            self.orderCard = OrderCard(self.orderDao.getOrderAt(0))
         else:
             self.orderCard = OrderCard(None)
 
@@ -344,16 +395,8 @@ class PosWidget(QFrame):
 
         self.setObjectName("pos-widget")
 
-    def updateViewList(self):
-        self.orderListView.clear()
-        for oneItem in self.orderDao.getOrderIdList():
-            oneQItem = QListWidgetItem(oneItem)
-            self.orderListView.addItem(oneQItem)
-
-    def updateOrderCard(self, item):
-        id = int(item.text())
-        orderList = self.orderDao.getOrderList()
-        self.orderCard.updateOrder(orderList[id - 1] if id > 0 else None)
+    def updateOrderCard(self, index: QModelIndex):
+        self.orderCard.updateOrder(index.data(OrderListModel.OrderRole))
 
     def updateOneOrder(self, updateOrderDto: UpdateOrderDto):
         order = self.orderDao.getOrderById(updateOrderDto.orderId)
@@ -362,7 +405,7 @@ class PosWidget(QFrame):
         if order.producedAmount == order.count:
             order.orderStatus = OrderStatus.COMPLETED.value
 
-        self.orderDao.updateOrder(order)
+        self.orderDao.updateOrderProgress(order)
         self.orderCard.updateOrder(order)
 
     def saveOrder(self, order: Order):
@@ -371,8 +414,9 @@ class PosWidget(QFrame):
     def startOrder(self, order: Order):
         order.orderStatus = OrderStatus.PRODUCING.value
 
-        self.outputSignal.changeStatus(True)
+        # the value must be in place before the change is queued for sending
         self.outputSignal.signalDto.value = order.toJson()
+        self.outputSignal.changeStatus(True)
 
         self.orderDao.updateOrder(order)
         self.orderCard.updateOrder(order)
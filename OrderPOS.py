@@ -1,7 +1,15 @@
+import bisect
+import collections
+import contextlib
+import gc
 import json
 import enum
+import operator
 import os
-from PySide6.QtCore import QObject, Signal
+import sqlite3
+import threading
+import time
+from PySide6.QtCore import QObject, QThread, Signal
 
 
 class OrderStatus(enum.Enum):
@@ -21,6 +29,8 @@ def orderClassSerializer(order):
 
 
 class OrderRecipe:
+    __slots__ = ("liqType", "capacity")
+
     def __init__(self, liqType, capacity):
         self.liqType: str = liqType
         self.capacity: float = capacity
@@ -31,8 +41,13 @@ class OrderRecipe:
             "capacity": self.capacity
         }
 
+    def toTuple(self) -> tuple:
+        return RECIPE_FIELD_GETTER(self)
+
 
 class Order:
+    __slots__ = ("orderId", "name", "desc", "bottleSizeInMilliL", "count", "orderStatus", "producedAmount", "recipe")
+
     def __init__(self, orderId, name, desc, bottleSizeInMilliL, count,
                  recipe=None, orderStatus="WAITING", producedAmount=0):
         self.producedAmount = producedAmount
@@ -67,23 +82,377 @@ class Order:
     def toJson(self) -> str:
         return json.dumps(self.toDict(), separators=(',', ':'))
 
+    def toTuple(self) -> tuple:
+        """ The ORDER_FIELDS followed by the recipes as (liqType, capacity) pairs """
+        return ORDER_FIELD_GETTER(self) + ([RECIPE_FIELD_GETTER(recipe) for recipe in self.recipe],)
+
+    @staticmethod
+    def fromTuple(values) -> "Order":
+        orderId, name, desc, bottleSizeInMilliL, count, orderStatus, producedAmount, recipes = values
+        return Order(orderId, name, desc, bottleSizeInMilliL, count,
+                     [OrderRecipe(liqType, capacity) for liqType, capacity in recipes], orderStatus, producedAmount)
+
+    @staticmethod
+    def fromDict(jsonDict: dict):
+        return Order(jsonDict["orderId"], jsonDict["name"], jsonDict["desc"], jsonDict["bottleSizeInMilliL"],
+                     jsonDict["count"],
+                     [OrderRecipe(recipe["liqType"], recipe["capacity"]) for recipe in jsonDict.get("recipe", ())],
+                     jsonDict["orderStatus"], jsonDict["producedAmount"])
+
+
+@contextlib.contextmanager
+def pausedGc():
+    """ Building or walking millions of small containers triggers a collection every few hundred of them,
+    none of which can free anything """
+    wasEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if wasEnabled:
+            gc.enable()
+
+
+ORDER_FIELDS = ("orderId", "name", "desc", "bottleSizeInMilliL", "count", "orderStatus", "producedAmount")
+ORDER_FIELD_GETTER = operator.attrgetter(*ORDER_FIELDS)
+RECIPE_FIELD_GETTER = operator.attrgetter(*OrderRecipe.__slots__)
+
+
+class OrderJournal:
+    """
+    The order list as a snapshot plus an append-only journal of the mutations made since. Every mutation is
+    one journal line carrying the whole order, so replaying the journal on top of any later snapshot gives the
+    same list again. Once the journal holds COMPACT_THRESHOLD entries it is folded into a new snapshot, which
+    replaces the old one by an atomic rename.
+
+    FORMAT_COMPACT writes orders as Order.toTuple rows instead of dicts, with no indentation. Both formats are
+    read whichever one is written.
+    """
+
+    OP_ADD = "add"
+    OP_UPDATE = "update"
+    OP_CLEAR = "clear"
+
+    FORMAT_JSON = "json"
+    FORMAT_COMPACT = "compact"
+
+    COMPACT_THRESHOLD = 1000
+
+    def __init__(self, snapshotPath: str, journalPath: str, snapshotFormat: str = FORMAT_JSON):
+        if snapshotFormat not in (self.FORMAT_JSON, self.FORMAT_COMPACT):
+            raise ValueError(f"unknown order format {snapshotFormat}")
+        self.snapshotPath = snapshotPath
+        self.journalPath = journalPath
+        self.snapshotFormat = snapshotFormat
+        self.journalFile = None
+        self.entryCount = 0
+
+    def load(self) -> tuple[list[Order], int]:
+        """ Returns the orders and the next order id, which stays above every id ever handed out """
+        with pausedGc():
+            return self.readFiles()
+
+    def readFiles(self) -> tuple[list[Order], int]:
+        orders: dict[int, Order] = {}
+        nextOrderId = 1
+
+        if os.path.exists(self.snapshotPath):
+            with open(self.snapshotPath, "r") as f:
+                allText = f.read()
+            if len(allText) > 0:
+                snapshot = json.loads(allText)
+                decode = Order.fromDict
+                # older snapshots are a bare list of orders
+                if isinstance(snapshot, dict):
+                    if snapshot.get("format") == self.FORMAT_COMPACT:
+                        if tuple(snapshot["fields"]) != ORDER_FIELDS:
+                            raise ValueError(f"{self.snapshotPath} has unknown order fields {snapshot['fields']}")
+                        decode = Order.fromTuple
+                    nextOrderId = snapshot["nextOrderId"]
+                    snapshot = snapshot["orders"]
+                for oneOrder in map(decode, snapshot):
+                    orders[oneOrder.orderId] = oneOrder
+                if len(orders) > 0:
+                    nextOrderId = max(nextOrderId, max(orders) + 1)
+
+        self.entryCount = 0
+        if os.path.exists(self.journalPath):
+            validSize = 0
+            unterminated = False
+            with open(self.journalPath, "rb") as f:
+                for lineNumber, line in enumerate(f, 1):
+                    # only the last line can miss its newline, a crash cut it off somewhere
+                    unterminated = not line.endswith(b"\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        if unterminated:
+                            break
+                        print(f"Error: {self.journalPath} line {lineNumber} is unreadable, skipping it")
+                        validSize += len(line)
+                        continue
+                    validSize += len(line)
+
+                    try:
+                        if entry["op"] == self.OP_CLEAR:
+                            orders.clear()
+                        else:
+                            oneOrder = Order.fromTuple(entry["row"]) if "row" in entry else Order.fromDict(entry["order"])
+                            orderNextId = oneOrder.orderId + 1
+                            orders[oneOrder.orderId] = oneOrder
+                            nextOrderId = max(nextOrderId, orderNextId)
+                    except (KeyError, TypeError, ValueError, AttributeError):
+                        print(f"Error: {self.journalPath} line {lineNumber} is not an order entry, skipping it")
+                        continue
+                    self.entryCount += 1
+
+            # the next entry would be appended to a torn line, drop what does not parse and end what does
+            if validSize < os.path.getsize(self.journalPath):
+                os.truncate(self.journalPath, validSize)
+            elif unterminated:
+                with open(self.journalPath, "ab") as f:
+                    f.write(b"\n")
+
+        return list(orders.values()), nextOrderId
+
+    def encodeEntry(self, op: str, order: Order | None = None) -> str:
+        if order is None:
+            return f'{{"op":"{op}"}}'
+        if self.snapshotFormat == self.FORMAT_COMPACT:
+            return f'{{"op":"{op}","row":{json.dumps(order.toTuple(), separators=(",", ":"))}}}'
+        return f'{{"op":"{op}","order":{order.toJson()}}}'
+
+    def appendLines(self, lines: list[str]):
+        if len(lines) == 0:
+            return
+        if self.journalFile is None:
+            self.journalFile = open(self.journalPath, "a")
+
+        start = self.journalFile.tell()
+        try:
+            self.journalFile.write("".join(line + "\n" for line in lines))
+            self.journalFile.flush()
+        except OSError:
+            # a retry must not append to a partly written line
+            self.closeJournalFile()
+            os.truncate(self.journalPath, start)
+            raise
+        self.entryCount += len(lines)
+
+    def needsCompaction(self) -> bool:
+        return self.entryCount >= self.COMPACT_THRESHOLD
+
+    def compact(self):
+        """ Folds the journal into a new snapshot. The orders are read back from the files, not taken from memory,
+        so this can run on another thread while the list keeps changing """
+        if self.journalFile is not None:
+            self.journalFile.flush()
+        orders, nextOrderId = self.load()
+        self.writeSnapshot(orders, nextOrderId)
+
+        # a crash before this point replays the old journal on top of the new snapshot, which is harmless
+        if self.journalFile is not None:
+            self.journalFile.close()
+        self.journalFile = open(self.journalPath, "w")
+        self.entryCount = 0
+
+    def writeSnapshot(self, orders: list[Order], nextOrderId: int):
+        with pausedGc():
+            if self.snapshotFormat == self.FORMAT_COMPACT:
+                text = json.dumps({"format": self.FORMAT_COMPACT, "fields": ORDER_FIELDS, "nextOrderId": nextOrderId,
+                                   "orders": [oneOrder.toTuple() for oneOrder in orders]}, separators=(",", ":"))
+            else:
+                text = json.dumps({"nextOrderId": nextOrderId, "orders": orders}, default=orderClassSerializer,
+                                  indent=2)
+
+        tmpPath = self.snapshotPath + ".tmp"
+        with open(tmpPath, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, self.snapshotPath)
+
+    def closeJournalFile(self):
+        try:
+            self.journalFile.close()
+        except OSError:
+            # what is still buffered is thrown away
+            pass
+        self.journalFile = None
+
+    def close(self):
+        if self.journalFile is not None:
+            self.journalFile.close()
+            self.journalFile = None
+
+
+class OrderWriteBehind(QThread):
+    """
+    Runs the writes of an order store on its own thread, so the caller only pays for queueing them. Writes
+    queued under the same key while they wait are merged into one, a barrier keeps later writes from being
+    merged into earlier ones. A batch is written once no write came in for DEBOUNCE seconds, and MAX_DELAY
+    seconds after its first write at the latest. A batch that fails stays pending and is retried, waiting twice
+    as long after every failure up to MAX_RETRY_DELAY. writeBatch has to be safe to repeat.
+    """
+    DEBOUNCE = 0.05
+    MAX_DELAY = 1.0
+    RETRY_DELAY = 0.5
+    MAX_RETRY_DELAY = 30.0
+
+    def __init__(self, writeBatch, merge=None):
+        super().__init__()
+        # called on this thread with the list of pending items, in the order they were queued
+        self.writeBatch = writeBatch
+        # merge(old, new) of two items with the same key, by default the newer one replaces the older
+        self.merge = merge
+
+        self.cond = threading.Condition()
+        self.pending: list = []
+        # key -> position in pending, cleared by a barrier
+        self.pendingIndex: dict = {}
+        self.firstPutTime = 0.0
+        self.lastPutTime = 0.0
+        self.putSeq = 0
+        self.writtenSeq = 0
+        self.failures = 0
+        self.retryTime = 0.0
+        self.flushing = False
+        self.stopping = False
+
+    def put(self, item, key=None, barrier: bool = False) -> int:
+        """ Returns the sequence number of the write, it is on disk once writtenSeq reaches it """
+        with self.cond:
+            now = time.monotonic()
+            self.lastPutTime = now
+            self.putSeq += 1
+
+            index = self.pendingIndex.get(key) if key is not None else None
+            if index is not None:
+                self.pending[index] = item if self.merge is None else self.merge(self.pending[index], item)
+                return self.putSeq
+
+            if barrier:
+                self.pendingIndex.clear()
+            elif key is not None:
+                self.pendingIndex[key] = len(self.pending)
+            self.pending.append(item)
+            if len(self.pending) == 1:
+                self.firstPutTime = now
+                # the thread only sleeps without a timeout while nothing is pending
+                self.cond.notify()
+            return self.putSeq
+
+    def flush(self) -> bool:
+        """ Blocks until every write queued so far is written, False when writing them failed """
+        with self.cond:
+            target = self.putSeq
+            if self.writtenSeq >= target:
+                return True
+            failures = self.failures
+            self.flushing = True
+            self.cond.notify_all()
+            while self.writtenSeq < target and self.failures == failures and self.isRunning():
+                self.cond.wait(0.1)
+            return self.writtenSeq >= target
+
+    def stop(self):
+        """ Writes what is pending and ends the thread """
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.wait()
+
+    def run(self):
+        retryDelay = 0.0
+        while True:
+            with self.cond:
+                while len(self.pending) == 0 and not self.stopping:
+                    self.cond.wait()
+                if len(self.pending) == 0:
+                    return
+
+                while not self.stopping and not self.flushing:
+                    deadline = min(self.lastPutTime + self.DEBOUNCE, self.firstPutTime + self.MAX_DELAY)
+                    wait = max(deadline, self.retryTime) - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self.cond.wait(wait)
+
+                batch, batchSeq = self.pending, self.putSeq
+                self.pending = []
+                self.pendingIndex = {}
+                self.flushing = False
+
+            error = None
+            try:
+                self.writeBatch(batch)
+            except Exception as e:
+                error = e
+
+            with self.cond:
+                self.cond.notify_all()
+                if error is None:
+                    self.writtenSeq = batchSeq
+                    retryDelay = 0.0
+                    continue
+
+                # ahead of what came in meanwhile, which must not be merged into it
+                self.pending = batch + self.pending
+                self.pendingIndex = {}
+                self.failures += 1
+                if self.stopping:
+                    print(f"Error: writing order changes failed, {len(self.pending)} of them are lost, {error}")
+                    return
+
+                retryDelay = min(max(retryDelay * 2, self.RETRY_DELAY), self.MAX_RETRY_DELAY)
+                self.retryTime = time.monotonic() + retryDelay
+                print(f"Error: writing {len(batch)} order changes failed, retrying in {retryDelay:.1f}s, {error}")
+
 
 class OrderDao:
+    """
+    Orders in creation order, indexed by id and by status. Ids come from a monotonic sequence that survives
+    clearAll and restarts, so an id is never handed out twice. Changes apply in memory right away, the journal
+    is written behind them on an OrderWriteBehind thread.
+    """
     ORDER_DATA_FILE = "./orderData.json"
+    ORDER_JOURNAL_FILE = "./orderData.journal"
 
     class OrderDaoSignalManager(QObject):
         sigOrderListChanged = Signal()
+        # the row of the order, emitted once the store holds the change
+        sigOrderAdded = Signal(int)
+        sigOrderUpdated = Signal(int)
+        sigOrdersCleared = Signal()
 
-    def __init__(self):
+    def __init__(self, snapshotFormat: str | None = None):
         self.orderList: list[Order] = []
+        # orderId -> position in orderList
+        self.rowById: dict[int, int] = {}
+        # the status each order is indexed under, orders are changed in place before updateOrder is called
+        self.indexedStatus: dict[int, str] = {}
+        self.idsByStatus: dict[str, set[int]] = {}
+        # per status, ids in the order they entered it. Entries of orders that left the status are dropped
+        # lazily when they reach the front, so the oldest order of a status is found in amortized O(1)
+        self.statusQueues: dict[str, collections.deque[int]] = {}
+        self.nextOrderId = 1
+
         self.sigMngr = self.OrderDaoSignalManager()
+        self.journal = OrderJournal(self.ORDER_DATA_FILE, self.ORDER_JOURNAL_FILE,
+                                    snapshotFormat or os.environ.get("ORDER_FORMAT", OrderJournal.FORMAT_JSON))
         self.loadOrderList()
+        self.writer = OrderWriteBehind(self.writeBatch)
+        self.writer.start()
 
     def addOrder(self, oneOrder: Order):
-        oneOrder.orderId = len(self.orderList) + 1
+        oneOrder.orderId = self.nextOrderId
+        self.nextOrderId += 1
+        self.rowById[oneOrder.orderId] = len(self.orderList)
         self.orderList.append(oneOrder)
+        self.indexStatus(oneOrder)
+        self.sigMngr.sigOrderAdded.emit(len(self.orderList) - 1)
         self.sigMngr.sigOrderListChanged.emit()
-        self.saveOrderList()
+        self.journalOrder(OrderJournal.OP_ADD, oneOrder)
 
     def getOrderList(self):
         return self.orderList
@@ -91,63 +460,410 @@ class OrderDao:
     def getOrderIdList(self):
         return [str(order.orderId) for order in self.orderList]
 
+    def getOrderCount(self) -> int:
+        return len(self.orderList)
+
+    def getOrderAt(self, row: int) -> Order:
+        return self.orderList[row]
+
+    def getOrderIdAt(self, row: int) -> int:
+        return self.orderList[row].orderId
+
+    def getOrderRow(self, orderId) -> int | None:
+        return self.rowById.get(orderId)
+
+    def getOrderPage(self, offset: int, limit: int, status: str | None = None) -> list[Order]:
+        if status is None:
+            return self.orderList[offset:offset + limit]
+        ids = sorted(self.getOrderIdsByStatus(status))[offset:offset + limit]
+        return [self.getOrderById(orderId) for orderId in ids]
+
     def getOrderById(self, orderId):
-        for oneOrder in self.orderList:
-            if oneOrder.orderId == orderId:
-                return oneOrder
-        return None
+        row = self.rowById.get(orderId)
+        return self.orderList[row] if row is not None else None
+
+    def getOrderIdsByStatus(self, status: str) -> set[int]:
+        return self.idsByStatus.get(status, set())
+
+    def getNextOrder(self, status: str = OrderStatus.WAITING.value) -> Order | None:
+        """ The oldest order that entered status and is still in it """
+        statusQueue = self.statusQueues.get(status)
+        if statusQueue is None:
+            return None
+
+        while len(statusQueue) > 0 and self.indexedStatus.get(statusQueue[0]) != status:
+            statusQueue.popleft()
+        return self.getOrderById(statusQueue[0]) if len(statusQueue) > 0 else None
 
     def clearAll(self):
         self.orderList = []
+        self.rowById.clear()
+        self.indexedStatus.clear()
+        self.idsByStatus.clear()
+        self.statusQueues.clear()
+        self.sigMngr.sigOrdersCleared.emit()
         self.sigMngr.sigOrderListChanged.emit()
-        self.saveOrderList()
+        self.journalOrder(OrderJournal.OP_CLEAR)
 
     def updateOrder(self, oneOrder: Order):
-        for i in range(len(self.orderList)):
-            if self.orderList[i].orderId == oneOrder.orderId:
-                self.orderList[i] = oneOrder
-                self.sigMngr.sigOrderListChanged.emit()
-                self.saveOrderList()
-                return True
+        row = self.rowById.get(oneOrder.orderId)
+        if row is None:
+            return False
+
+        self.orderList[row] = oneOrder
+        self.indexStatus(oneOrder)
+        self.sigMngr.sigOrderUpdated.emit(row)
+        self.sigMngr.sigOrderListChanged.emit()
+        self.journalOrder(OrderJournal.OP_UPDATE, oneOrder)
+        return True
 
-        return False
+    def updateOrderProgress(self, oneOrder: Order):
+        """ Only producedAmount and orderStatus changed """
+        return self.updateOrder(oneOrder)
+
+    def indexStatus(self, oneOrder: Order):
+        oldStatus = self.indexedStatus.get(oneOrder.orderId)
+        if oldStatus == oneOrder.orderStatus:
+            return
+
+        if oldStatus is not None:
+            self.idsByStatus[oldStatus].discard(oneOrder.orderId)
+        self.indexedStatus[oneOrder.orderId] = oneOrder.orderStatus
+        self.idsByStatus.setdefault(oneOrder.orderStatus, set()).add(oneOrder.orderId)
+        self.statusQueues.setdefault(oneOrder.orderStatus, collections.deque()).append(oneOrder.orderId)
+
+    def journalOrder(self, op: str, oneOrder: Order | None = None):
+        # encoded here, the order may change again before the writer gets to it
+        entry = self.journal.encodeEntry(op, oneOrder)
+        if oneOrder is None:
+            self.writer.put(entry, barrier=True)
+        else:
+            # every entry carries the whole order, so a newer one of the same order replaces a pending one
+            self.writer.put(entry, key=oneOrder.orderId)
+
+    def writeBatch(self, batch: list[str | None]):
+        lines = []
+        for entry in batch:
+            if entry is None:
+                self.journal.appendLines(lines)
+                lines = []
+                self.journal.compact()
+            else:
+                lines.append(entry)
+        self.journal.appendLines(lines)
+
+        if self.journal.needsCompaction():
+            self.journal.compact()
 
     def saveOrderList(self):
-        if os.path.exists(self.ORDER_DATA_FILE):
-            os.remove(self.ORDER_DATA_FILE)
+        """ Writes a full snapshot and starts an empty journal """
+        self.writer.put(None, barrier=True)
+        self.writer.flush()
 
-        with open(self.ORDER_DATA_FILE, "w") as f:
-            s = json.dumps(self.orderList, default=orderClassSerializer, indent=2)
-            f.write(s)
+    def flush(self) -> bool:
+        """ Blocks until every change made so far is in the journal, False when writing it failed """
+        return self.writer.flush()
+
+    def close(self):
+        self.writer.stop()
+        self.journal.close()
 
     def loadOrderList(self):
-        if not os.path.exists(self.ORDER_DATA_FILE):
-            self.orderList = []
+        self.orderList, self.nextOrderId = self.journal.load()
+        self.rowById = {oneOrder.orderId: row for row, oneOrder in enumerate(self.orderList)}
+        self.indexedStatus.clear()
+        self.idsByStatus.clear()
+        self.statusQueues.clear()
+        for oneOrder in self.orderList:
+            self.indexStatus(oneOrder)
+
+
+class SqliteOrderDao:
+    """
+    OrderDao on SQLite, only the ids are kept in memory and orders are read when asked for. Recipes live in
+    their own table. Existing JSON order data is moved in the first time the database is created. Changes are
+    written behind on an OrderWriteBehind thread with its own connection, one transaction per batch.
+    """
+    ORDER_DB_FILE = "./orderData.db"
+    CACHE_SIZE = 256
+
+    # pending writes of one order merge into the strongest of them, each carries the whole order
+    WRITE_PROGRESS = 0
+    WRITE_UPDATE = 1
+    WRITE_INSERT = 2
+    WRITE_CLEAR = 3
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            orderId INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            desc TEXT NOT NULL,
+            bottleSizeInMilliL REAL NOT NULL,
+            count INTEGER NOT NULL,
+            orderStatus TEXT NOT NULL,
+            producedAmount INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ordersByStatus ON orders (orderStatus, orderId);
+        CREATE TABLE IF NOT EXISTS recipes (
+            orderId INTEGER NOT NULL REFERENCES orders (orderId) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            liqType TEXT NOT NULL,
+            capacity REAL NOT NULL,
+            PRIMARY KEY (orderId, position)
+        );
+    """
+
+    def __init__(self, dbPath: str | None = None):
+        self.dbPath = dbPath or self.ORDER_DB_FILE
+        isNew = not os.path.exists(self.dbPath)
+
+        self.conn = self.connect()
+        self.conn.executescript(self.SCHEMA)
+
+        self.sigMngr = OrderDao.OrderDaoSignalManager()
+        # recently read orders, callers change them in place before updating
+        self.cache: collections.OrderedDict[int, Order] = collections.OrderedDict()
+        # orderId -> (write sequence, order) of orders with writes that may not be in the database yet
+        self.unwritten: dict[int, tuple[int, Order]] = {}
+        self.prunedSeq = 0
+
+        if isNew:
+            self.migrateFromJson(OrderDao.ORDER_DATA_FILE, OrderDao.ORDER_JOURNAL_FILE)
+        self.orderIds: list[int] = [row[0] for row in self.conn.execute("SELECT orderId FROM orders ORDER BY orderId")]
+        # ids are handed out here, the inserts happen later on the writer
+        row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'").fetchone()
+        self.nextOrderId = max(row[0] if row is not None else 0, self.orderIds[-1] if self.orderIds else 0) + 1
+
+        # only used by the writer thread, and closed after it has stopped
+        self.writeConn = self.connect(checkSameThread=False)
+        self.writer = OrderWriteBehind(self.writeBatch, merge=lambda old, new: (max(old[0], new[0]),) + new[1:])
+        self.writer.start()
+
+    def connect(self, checkSameThread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.dbPath, check_same_thread=checkSameThread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def migrateFromJson(self, snapshotPath: str, journalPath: str):
+        if not os.path.exists(snapshotPath) and not os.path.exists(journalPath):
             return
 
-        with open(self.ORDER_DATA_FILE, "r") as f:
-            allText = f.read()
-            if len(allText) == 0:
-                self.orderList = []
-                return
+        journal = OrderJournal(snapshotPath, journalPath)
+        orders, nextOrderId = journal.load()
+        journal.close()
+        with self.conn:
+            for oneOrder in orders:
+                self.insertOrder(oneOrder)
+            self.setNextOrderId(nextOrderId)
+
+        for path in (snapshotPath, journalPath):
+            if os.path.exists(path):
+                os.replace(path, path + ".migrated")
+        print(f"Migrated {len(orders)} orders into {self.dbPath}")
+
+    def setNextOrderId(self, nextOrderId: int):
+        # AUTOINCREMENT continues after the sequence value, even once rows are deleted
+        updated = self.conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'orders'",
+                                    (nextOrderId - 1,)).rowcount
+        if updated == 0:
+            self.conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('orders', ?)", (nextOrderId - 1,))
+
+    def insertOrder(self, oneOrder: Order):
+        self.conn.execute(
+            "INSERT INTO orders (orderId, name, desc, bottleSizeInMilliL, count, orderStatus, producedAmount) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (oneOrder.orderId, oneOrder.name, oneOrder.desc, oneOrder.bottleSizeInMilliL,
+             oneOrder.count, oneOrder.orderStatus, oneOrder.producedAmount))
+        self.writeRecipes(oneOrder)
+
+    def writeRecipes(self, oneOrder: Order):
+        self.conn.execute("DELETE FROM recipes WHERE orderId = ?", (oneOrder.orderId,))
+        self.conn.executemany("INSERT INTO recipes (orderId, position, liqType, capacity) VALUES (?, ?, ?, ?)",
+                              [(oneOrder.orderId, i, recipe.liqType, recipe.capacity)
+                               for i, recipe in enumerate(oneOrder.recipe)])
+
+    def readOrders(self, query: str, args=()) -> list[Order]:
+        """ query selects the order columns in table order """
+        orders = [Order(orderId, name, desc, bottleSizeInMilliL, count, orderStatus=orderStatus,
+                        producedAmount=producedAmount)
+                  for orderId, name, desc, bottleSizeInMilliL, count, orderStatus, producedAmount
+                  in self.conn.execute(query, args)]
+        if len(orders) == 0:
+            return orders
+
+        byId = {oneOrder.orderId: oneOrder for oneOrder in orders}
+        placeholders = ",".join("?" * len(byId))
+        for orderId, liqType, capacity in self.conn.execute(
+                f"SELECT orderId, liqType, capacity FROM recipes WHERE orderId IN ({placeholders}) "
+                f"ORDER BY orderId, position", list(byId)):
+            byId[orderId].addRecipe(OrderRecipe(liqType, capacity))
+
+        # hand out the cached object where there is one, it may hold changes that are not written yet
+        return [self.cache.get(oneOrder.orderId, oneOrder) for oneOrder in orders]
+
+    def cacheOrder(self, oneOrder: Order):
+        self.cache[oneOrder.orderId] = oneOrder
+        self.cache.move_to_end(oneOrder.orderId)
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def getOrderRow(self, orderId) -> int | None:
+        # orderIds is ascending, ids only ever grow
+        row = bisect.bisect_left(self.orderIds, orderId)
+        return row if row < len(self.orderIds) and self.orderIds[row] == orderId else None
+
+    def queueWrite(self, kind: int, oneOrder: Order):
+        # ORDER_FIELDS are the columns of orders in table order, the recipes come last
+        values = oneOrder.toTuple()
+        seq = self.writer.put((kind, values[:-1], values[-1]), key=oneOrder.orderId)
+
+        # keep the order readable until its row is written, the cache may drop it before that
+        self.unwritten[oneOrder.orderId] = (seq, oneOrder)
+        writtenSeq = self.writer.writtenSeq
+        if len(self.unwritten) > self.CACHE_SIZE and writtenSeq != self.prunedSeq:
+            # at most once per written batch
+            self.prunedSeq = writtenSeq
+            self.unwritten = {orderId: entry for orderId, entry in self.unwritten.items() if entry[0] > writtenSeq}
+
+    def writeBatch(self, batch: list[tuple]):
+        with self.writeConn as conn:
+            for kind, row, recipes in batch:
+                if kind == self.WRITE_CLEAR:
+                    conn.execute("DELETE FROM orders")
+                    continue
+
+                orderId = row[0]
+                if kind == self.WRITE_PROGRESS:
+                    conn.execute("UPDATE orders SET orderStatus = ?, producedAmount = ? WHERE orderId = ?",
+                                 (row[5], row[6], orderId))
+                    continue
+
+                if kind == self.WRITE_INSERT:
+                    conn.execute("INSERT INTO orders (orderId, name, desc, bottleSizeInMilliL, count, orderStatus, "
+                                 "producedAmount) VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+                else:
+                    conn.execute("UPDATE orders SET name = ?, desc = ?, bottleSizeInMilliL = ?, count = ?, "
+                                 "orderStatus = ?, producedAmount = ? WHERE orderId = ?", row[1:] + row[:1])
+                    conn.execute("DELETE FROM recipes WHERE orderId = ?", (orderId,))
+                conn.executemany("INSERT INTO recipes (orderId, position, liqType, capacity) VALUES (?, ?, ?, ?)",
+                                 [(orderId, i, liqType, capacity) for i, (liqType, capacity) in enumerate(recipes)])
+
+    def addOrder(self, oneOrder: Order):
+        oneOrder.orderId = self.nextOrderId
+        self.nextOrderId += 1
+        self.orderIds.append(oneOrder.orderId)
+        self.cacheOrder(oneOrder)
+        self.queueWrite(self.WRITE_INSERT, oneOrder)
+        self.sigMngr.sigOrderAdded.emit(len(self.orderIds) - 1)
+        self.sigMngr.sigOrderListChanged.emit()
+
+    def getOrderList(self):
+        """ Reads every order, prefer getOrderPage """
+        self.writer.flush()
+        return self.readOrders("SELECT * FROM orders ORDER BY orderId")
+
+    def getOrderIdList(self):
+        return [str(orderId) for orderId in self.orderIds]
+
+    def getOrderCount(self) -> int:
+        return len(self.orderIds)
+
+    def getOrderAt(self, row: int) -> Order:
+        return self.getOrderById(self.orderIds[row])
+
+    def getOrderIdAt(self, row: int) -> int:
+        return self.orderIds[row]
+
+    def getOrderPage(self, offset: int, limit: int, status: str | None = None) -> list[Order]:
+        # queries have to see the pending writes
+        self.writer.flush()
+        if status is None:
+            return self.readOrders("SELECT * FROM orders ORDER BY orderId LIMIT ? OFFSET ?", (limit, offset))
+        return self.readOrders("SELECT * FROM orders WHERE orderStatus = ? ORDER BY orderId LIMIT ? OFFSET ?",
+                               (status, limit, offset))
+
+    def getOrderById(self, orderId):
+        oneOrder = self.cache.get(orderId)
+        if oneOrder is None and orderId in self.unwritten:
+            oneOrder = self.unwritten[orderId][1]
+        if oneOrder is None:
+            orders = self.readOrders("SELECT * FROM orders WHERE orderId = ?", (orderId,))
+            if len(orders) == 0:
+                return None
+            oneOrder = orders[0]
+        self.cacheOrder(oneOrder)
+        return oneOrder
+
+    def getOrderIdsByStatus(self, status: str) -> set[int]:
+        self.writer.flush()
+        return {row[0] for row in self.conn.execute("SELECT orderId FROM orders WHERE orderStatus = ?", (status,))}
+
+    def getNextOrder(self, status: str = OrderStatus.WAITING.value) -> Order | None:
+        """ The oldest order in status """
+        self.writer.flush()
+        orders = self.readOrders("SELECT * FROM orders WHERE orderStatus = ? ORDER BY orderId LIMIT 1", (status,))
+        return orders[0] if len(orders) > 0 else None
+
+    def clearAll(self):
+        self.orderIds = []
+        self.cache.clear()
+        self.unwritten.clear()
+        self.writer.put((self.WRITE_CLEAR, None, None), barrier=True)
+        self.sigMngr.sigOrdersCleared.emit()
+        self.sigMngr.sigOrderListChanged.emit()
+
+    def updateOrder(self, oneOrder: Order):
+        row = self.getOrderRow(oneOrder.orderId)
+        if row is None:
+            return False
+
+        self.cacheOrder(oneOrder)
+        self.queueWrite(self.WRITE_UPDATE, oneOrder)
+        self.sigMngr.sigOrderUpdated.emit(row)
+        self.sigMngr.sigOrderListChanged.emit()
+        return True
+
+    def updateOrderProgress(self, oneOrder: Order):
+        """ Only producedAmount and orderStatus changed, a single row update """
+        row = self.getOrderRow(oneOrder.orderId)
+        if row is None:
+            return False
+
+        self.cacheOrder(oneOrder)
+        self.queueWrite(self.WRITE_PROGRESS, oneOrder)
+        self.sigMngr.sigOrderUpdated.emit(row)
+        self.sigMngr.sigOrderListChanged.emit()
+        return True
+
+    def saveOrderList(self):
+        """ Writes what is pending and folds the WAL back into the database """
+        self.writer.flush()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def flush(self) -> bool:
+        """ Blocks until every change made so far is committed, False when committing it failed """
+        return self.writer.flush()
 
-            orderJsonList = json.loads(allText)
+    def close(self):
+        self.writer.stop()
+        self.writeConn.close()
+        self.conn.close()
 
-            for oneJsonDict in orderJsonList:
-                oneOrder = Order(0, "", "", 0, 0)
-                oneOrder.orderId = oneJsonDict["orderId"]
-                oneOrder.name = oneJsonDict["name"]
-                oneOrder.desc = oneJsonDict["desc"]
-                oneOrder.producedAmount = oneJsonDict["producedAmount"]
-                oneOrder.bottleSizeInMilliL = oneJsonDict["bottleSizeInMilliL"]
-                oneOrder.count = oneJsonDict["count"]
 
-                for recipe in oneJsonDict["recipe"]:
-                    oneOrder.addRecipe(OrderRecipe(recipe["liqType"], recipe["capacity"]))
+ORDER_BACKEND_JSON = "json"
+ORDER_BACKEND_SQLITE = "sqlite"
 
-                oneOrder.orderStatus = oneJsonDict["orderStatus"]
 
-                self.orderList.append(oneOrder)
+def createOrderDao(backend: str | None = None):
+    """ The backend defaults to the ORDER_BACKEND environment variable, json when it is not set """
+    backend = backend or os.environ.get("ORDER_BACKEND", ORDER_BACKEND_JSON)
+    if backend == ORDER_BACKEND_SQLITE:
+        return SqliteOrderDao()
+    if backend == ORDER_BACKEND_JSON:
+        return OrderDao()
+    raise ValueError(f"unknown order backend {backend}")
 
 
 class UpdateOrderDto:
@@ -172,3 +888,4 @@ if __name__ == '__main__':
     orderDao.clearAll()
 
     orderDao.saveOrderList()
+    orderDao.close()
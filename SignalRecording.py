@@ -0,0 +1,203 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from SysjSignal import OutputSignal, SignalBase, SocketBaseInfo
+
+RECORDING_MAGIC = b"SJREC\x01"
+HEADER_STRUCT = struct.Struct("<qd")  # monotonic ns and wall clock time the recording started at
+
+DIRECTION_IN = 0
+DIRECTION_OUT = 1
+
+REC_SIGNAL = 0
+REC_STATE = 1
+REC_STATE_INT = 2
+REC_STATE_FLOAT = 3
+REC_STATE_JSON = 4
+# type, id, direction, port, then cd, name and the length prefixed ip
+SIGNAL_STRUCT = struct.Struct("<BHBHHH")
+# type, id, status, ns since the start of the recording, then the value of its type
+STATE_STRUCT = struct.Struct("<BHBq")
+STATE_INT_STRUCT = struct.Struct("<BHBqq")
+STATE_FLOAT_STRUCT = struct.Struct("<BHBqd")
+STATE_JSON_STRUCT = struct.Struct("<BHBqI")
+MAX_SIGNALS = 1 << 16
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+class RecordedSignal:
+    def __init__(self, sigId: int, direction: int, cd: str, name: str, ip: str, port: int):
+        self.sigId = sigId
+        self.direction = direction
+        self.cd = cd
+        self.name = name
+        self.socketInfo = SocketBaseInfo(ip, port)
+
+
+class RecordedState:
+    def __init__(self, signal: RecordedSignal, status: bool, value, timestamp: int):
+        self.signal = signal
+        self.status = status
+        self.value = value
+        # ns since the start of the recording
+        self.timestamp = timestamp
+
+
+class SignalRecorder:
+    """
+    Appends every signal transition to a binary log. A signal is described once by a REC_SIGNAL record,
+    its transitions refer to it by id. Safe to call from any thread.
+    """
+
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.file = open(path, "wb", buffering=self.BUFFER_SIZE)
+        self.startNs = time.monotonic_ns()
+        # None for a signal that does not fit the format, it is reported once and never recorded
+        self.ids: dict[tuple[int, str, str], int | None] = {}
+        self.signalCount = 0
+
+        self.file.write(RECORDING_MAGIC)
+        self.file.write(HEADER_STRUCT.pack(self.startNs, time.time()))
+
+    def recordOutput(self, signal: OutputSignal):
+        self.record(DIRECTION_OUT, signal.cd, signal.name, signal.signalDto.status, signal.signalDto.value,
+                    signal.socketInfo)
+
+    def recordInput(self, signal: SignalBase, socketInfo: SocketBaseInfo):
+        self.record(DIRECTION_IN, signal.cd, signal.name, signal.status, signal.value, socketInfo)
+
+    def record(self, direction: int, cd: str, name: str, status: bool, value, socketInfo: SocketBaseInfo):
+        timestamp = time.monotonic_ns() - self.startNs
+
+        with self.lock:
+            if self.file is None:
+                return
+
+            key = (direction, cd, name)
+            if key in self.ids:
+                sigId = self.ids[key]
+            else:
+                sigId = self.ids[key] = self.writeSignal(direction, cd, name, socketInfo)
+            if sigId is None:
+                return
+
+            if value is None:
+                self.file.write(STATE_STRUCT.pack(REC_STATE, sigId, status, timestamp))
+            elif isinstance(value, float):
+                self.file.write(STATE_FLOAT_STRUCT.pack(REC_STATE_FLOAT, sigId, status, timestamp, value))
+            elif isinstance(value, int) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX:
+                self.file.write(STATE_INT_STRUCT.pack(REC_STATE_INT, sigId, status, timestamp, value))
+            else:
+                text = json.dumps(value).encode()
+                self.file.write(STATE_JSON_STRUCT.pack(REC_STATE_JSON, sigId, status, timestamp, len(text)))
+                self.file.write(text)
+
+    def writeSignal(self, direction: int, cd: str, name: str, socketInfo: SocketBaseInfo) -> int | None:
+        cdBytes, nameBytes, ip = cd.encode(), name.encode(), socketInfo.ip.encode()
+        sigId = self.signalCount
+        if sigId >= MAX_SIGNALS or len(cdBytes) > 0xFFFF or len(nameBytes) > 0xFFFF or len(ip) > 0xFF:
+            print(f"Error: {cd}.{name} on {socketInfo.ip}:{socketInfo.port} can not be recorded")
+            return None
+
+        self.file.write(SIGNAL_STRUCT.pack(REC_SIGNAL, sigId, direction, socketInfo.port,
+                                           len(cdBytes), len(nameBytes)))
+        self.file.write(cdBytes + nameBytes + bytes([len(ip)]) + ip)
+        self.signalCount += 1
+        return sigId
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class SignalLog:
+    """ Reads a recording through mmap, so it is never loaded as a whole """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else b""
+
+        headerEnd = len(RECORDING_MAGIC) + HEADER_STRUCT.size
+        if self.size < headerEnd or self.map[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a signal recording")
+        self.startNs, self.startTime = HEADER_STRUCT.unpack_from(self.map, len(RECORDING_MAGIC))
+        self.dataStart = headerEnd
+
+        self.signals: list[RecordedSignal] = []
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __iter__(self):
+        return self.states()
+
+    def states(self):
+        """ Yields every RecordedState in order, a record cut off at the end of the file is ignored """
+        buf = self.map
+        size = self.size
+        pos = self.dataStart
+        signals = self.signals
+        signals.clear()
+
+        while pos < size:
+            recType = buf[pos]
+            if recType == REC_STATE:
+                if size - pos < STATE_STRUCT.size:
+                    return
+                _, sigId, status, timestamp = STATE_STRUCT.unpack_from(buf, pos)
+                pos += STATE_STRUCT.size
+                value = None
+            elif recType == REC_STATE_INT or recType == REC_STATE_FLOAT:
+                valueStruct = STATE_INT_STRUCT if recType == REC_STATE_INT else STATE_FLOAT_STRUCT
+                if size - pos < valueStruct.size:
+                    return
+                _, sigId, status, timestamp, value = valueStruct.unpack_from(buf, pos)
+                pos += valueStruct.size
+            elif recType == REC_STATE_JSON:
+                if size - pos < STATE_JSON_STRUCT.size:
+                    return
+                _, sigId, status, timestamp, length = STATE_JSON_STRUCT.unpack_from(buf, pos)
+                end = pos + STATE_JSON_STRUCT.size + length
+                if size < end:
+                    return
+                value = json.loads(buf[pos + STATE_JSON_STRUCT.size:end])
+                pos = end
+            elif recType == REC_SIGNAL:
+                if size - pos < SIGNAL_STRUCT.size:
+                    return
+                _, sigId, direction, port, cdLength, nameLength = SIGNAL_STRUCT.unpack_from(buf, pos)
+                start = pos + SIGNAL_STRUCT.size
+                if size < start + cdLength + nameLength + 1:
+                    return
+                ipStart = start + cdLength + nameLength + 1
+                end = ipStart + buf[ipStart - 1]
+                if size < end:
+                    return
+                signals.append(RecordedSignal(sigId, direction, bytes(buf[start:start + cdLength]).decode(),
+                                              bytes(buf[start + cdLength:ipStart - 1]).decode(),
+                                              bytes(buf[ipStart:end]).decode(), port))
+                pos = end
+                continue
+            else:
+                raise ValueError(f"unknown record type {recType} at offset {pos}")
+
+            yield RecordedState(signals[sigId], bool(status), value, timestamp)
@@ -0,0 +1,464 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+
+from PySide6.QtCore import QThread, Signal
+
+from SysjSignal import OutputSignal
+
+
+class SimulationProcess:
+    """
+    A sequence running inside a SimulationEngine. The sequence is a generator that yields either a delay in
+    virtual seconds or another SimulationProcess to wait for.
+    """
+
+    def __init__(self, engine, sequence, name=""):
+        self.engine = engine
+        self.sequence = sequence
+        self.name = name
+        self.done = False
+        self.cancelled = False
+        self.waiters: list[SimulationProcess] = []
+
+    def step(self):
+        if self.done:
+            return
+
+        if self.cancelled:
+            self.sequence.close()
+            self.finish()
+            return
+
+        try:
+            waitFor = next(self.sequence)
+        except StopIteration:
+            self.finish()
+            return
+
+        if isinstance(waitFor, SimulationProcess):
+            if waitFor.done:
+                self.engine.schedule(0, self.step)
+            else:
+                waitFor.waiters.append(self)
+        else:
+            self.engine.schedule(waitFor or 0, self.step)
+
+    def finish(self):
+        self.done = True
+        for waiter in self.waiters:
+            self.engine.schedule(0, waiter.step)
+        self.waiters.clear()
+
+    def cancel(self):
+        """ Stops the sequence right away, must be called on the thread running the engine """
+        if not self.done:
+            self.cancelled = True
+            self.engine.schedule(0, self.step)
+
+
+class SimulationEngine:
+    """
+    Discrete event simulation on a virtual clock.
+    speed 1.0 runs in wall clock time, N runs N times faster, None runs as fast as possible.
+    Events at the same virtual time run in the order they were scheduled, so a run is deterministic.
+    """
+
+    def __init__(self, speed: float | None = 1.0):
+        self.speed = speed
+        self.now = 0.0
+        self.events: list[tuple[float, int, object, tuple]] = []
+        self.seq = itertools.count()
+
+    def schedule(self, delay: float, callback, *args):
+        heapq.heappush(self.events, (self.now + delay, next(self.seq), callback, args))
+
+    def spawn(self, sequence, name="") -> SimulationProcess:
+        process = SimulationProcess(self, sequence, name)
+        self.schedule(0, process.step)
+        return process
+
+    def nextEventTime(self) -> float | None:
+        return self.events[0][0] if len(self.events) > 0 else None
+
+    def run(self, until: float | None = None):
+        """ Runs until no event is left, or until the virtual clock reaches until """
+        wallStart = time.monotonic()
+        virtualStart = self.now
+
+        while len(self.events) > 0:
+            eventTime = self.events[0][0]
+            if until is not None and eventTime > until:
+                break
+
+            if self.speed is not None:
+                wait = wallStart + (eventTime - virtualStart) / self.speed - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+
+            _, _, callback, args = heapq.heappop(self.events)
+            self.now = eventTime
+            callback(*args)
+
+        if until is not None and until > self.now:
+            self.now = until
+
+
+class SequenceDefinitionError(Exception):
+    pass
+
+
+class CompiledSequence:
+    """
+    A sequence flattened into a timeline of (offset, ((signal, status), ...)) with every signal already resolved,
+    so running it is one engine event per distinct offset.
+    """
+
+    def __init__(self, name: str, timeline: list[tuple[float, tuple]], stations: tuple[str, ...]):
+        self.name = name
+        self.timeline = timeline
+        self.stations = stations
+        self.duration = timeline[-1][0] if len(timeline) > 0 else 0.0
+
+    def run(self):
+        now = 0.0
+        for offset, changes in self.timeline:
+            if offset > now:
+                yield offset - now
+                now = offset
+            for signal, status in changes:
+                signal.changeStatus(status)
+
+
+class SequenceLibrary:
+    """
+    Station sequences declared as data, e.g. in res/sequences.json:
+        {"name": {"params": [{...}, ...], "steps": [[signalName, status, delay], ["@otherSequence", {params}, delay]]}}
+    delay is in seconds after the previous step, signal names may use {param} placeholders.
+    Every sequence is checked against the registered signals and compiled for each of its params when loaded.
+    """
+
+    SEQUENCE_FILE = "./res/sequences.json"
+
+    def __init__(self, definitions: dict, signalsByStation: dict[str, list[OutputSignal]]):
+        self.definitions = definitions
+        self.signalByName: dict[str, OutputSignal] = {}
+        self.stationBySignal: dict[OutputSignal, str] = {}
+        for station, signals in signalsByStation.items():
+            for signal in signals:
+                self.signalByName[signal.name] = signal
+                self.stationBySignal[signal] = station
+
+        if not isinstance(definitions, dict):
+            raise SequenceDefinitionError("sequences must be an object keyed by sequence name")
+        for name, definition in definitions.items():
+            if not isinstance(definition, dict) or not isinstance(definition.get("steps"), list):
+                raise SequenceDefinitionError(f"{name}: sequence needs a list of steps")
+            allParams = definition.get("params", [{}])
+            if not isinstance(allParams, list) or not all(self.isParams(params) for params in allParams):
+                raise SequenceDefinitionError(f"{name}: params must be a list of objects with plain values")
+
+        self.compiled: dict[tuple, CompiledSequence] = {}
+        for name, definition in definitions.items():
+            for params in definition.get("params", [{}]):
+                self.compile(name, **params)
+
+    @staticmethod
+    def isParams(params) -> bool:
+        return isinstance(params, dict) and all(isinstance(value, (str, int, float)) for value in params.values())
+
+    @classmethod
+    def fromFile(cls, signalsByStation: dict[str, list[OutputSignal]], path=SEQUENCE_FILE):
+        with open(path, "r") as f:
+            return cls(json.load(f), signalsByStation)
+
+    def compile(self, name: str, **params) -> CompiledSequence:
+        key = (name, tuple(sorted(params.items())))
+        sequence = self.compiled.get(key)
+        if sequence is None:
+            changes = self.flatten(name, params, 0.0, ())
+            timeline = []
+            # a stable sort keeps the declared order of steps at the same offset
+            for offset, change in sorted(changes, key=lambda c: c[0]):
+                if len(timeline) > 0 and timeline[-1][0] == offset:
+                    timeline[-1][1].append(change)
+                else:
+                    timeline.append((offset, [change]))
+            timeline = [(offset, tuple(stepChanges)) for offset, stepChanges in timeline]
+
+            stations = tuple(sorted({self.stationBySignal[signal] for _, (signal, _) in changes}))
+            sequence = self.compiled[key] = CompiledSequence(name, timeline, stations)
+        return sequence
+
+    def flatten(self, name: str, params: dict, start: float, parents: tuple) -> list[tuple[float, tuple]]:
+        """ Returns (offset, (signal, status)) for every step, offsets relative to the outermost sequence """
+        if name not in self.definitions:
+            raise SequenceDefinitionError(f"{' -> '.join(parents + (name,))}: unknown sequence")
+        if name in parents:
+            raise SequenceDefinitionError(f"{' -> '.join(parents + (name,))}: sequence includes itself")
+
+        changes = []
+        cursor = start
+        for step in self.definitions[name]["steps"]:
+            try:
+                target, value, delay = step
+                cursor += float(delay)
+            except (TypeError, ValueError):
+                raise SequenceDefinitionError(f"{name}: malformed step {step}")
+
+            if not isinstance(target, str):
+                raise SequenceDefinitionError(f"{name}: step target {target!r} must be a signal or @sequence name")
+            if target.startswith("@"):
+                if value is not None and not self.isParams(value):
+                    raise SequenceDefinitionError(f"{name}: params of {target} must be an object with plain values")
+                subChanges = self.flatten(target[1:], value or {}, cursor, parents + (name,))
+                changes += subChanges
+                cursor = max([cursor] + [offset for offset, _ in subChanges])
+                continue
+
+            try:
+                signalName = target.format(**params)
+            except KeyError as e:
+                raise SequenceDefinitionError(f"{name}: missing parameter {e} in {target}")
+            except (IndexError, ValueError):
+                raise SequenceDefinitionError(f"{name}: malformed signal name {target}")
+            signal = self.signalByName.get(signalName)
+            if signal is None:
+                raise SequenceDefinitionError(f"{name}: no output signal named {signalName}")
+            if not isinstance(value, bool):
+                raise SequenceDefinitionError(f"{name}: status of {signalName} must be true or false")
+            changes.append((cursor, (signal, value)))
+
+        return changes
+
+
+class PipelinedLineSimulation:
+    """
+    The rotary line with a bottle on every table position. Each station works on its own bottle in parallel
+    and the table indexes once all of them are done, so a bottle leaves POS5 on every index.
+    """
+
+    # table positions from POS1 to POS5 and the sequence processing the bottle there
+    POSITIONS = [None, ("filler", {"idx": "A"}), ("filler", {"idx": "B"}), ("filler", {"idx": "C"}),
+                 ("filler", {"idx": "D"}), ("capper", {}), None]
+    SETTLE_TIME = 0.5
+
+    def __init__(self, library: SequenceLibrary, bottleCount: int):
+        self.library = library
+        self.bottleCount = bottleCount
+
+        self.rotary = library.compile("rotary")
+        self.positionSequences = [library.compile(name, **params) if name is not None else None
+                                  for name, params in (position or (None, {}) for position in self.POSITIONS)]
+        self.loadSignal = library.signalByName["bottleAtPos1"]
+        self.unloadSignal = library.signalByName["bottleLeftPos5"]
+
+        self.busyTime: dict[str, float] = {}
+        self.completed = 0
+        self.elapsed = 0.0
+
+    def getStations(self) -> tuple[str, ...]:
+        stations = set(self.rotary.stations)
+        stations.add(self.library.stationBySignal[self.loadSignal])
+        stations.add(self.library.stationBySignal[self.unloadSignal])
+        for sequence in self.positionSequences:
+            if sequence is not None:
+                stations.update(sequence.stations)
+        return tuple(sorted(stations))
+
+    def timed(self, engine: SimulationEngine, sequence: CompiledSequence):
+        start = engine.now
+        yield from sequence.run()
+        station = "/".join(sequence.stations)
+        self.busyTime[station] = self.busyTime.get(station, 0.0) + engine.now - start
+
+    def run(self, engine: SimulationEngine):
+        start = engine.now
+        # bottle number on each table position
+        slots = [None] * len(self.POSITIONS)
+        nextBottle = 0
+        # the station sequences of the current step, they outlive this generator unless cancelled with it
+        processes: list[SimulationProcess] = []
+
+        try:
+            while self.completed < self.bottleCount:
+                if self.unloadSignal.status:
+                    self.unloadSignal.changeStatus(False)
+                if nextBottle < self.bottleCount:
+                    slots[0] = nextBottle
+                    nextBottle += 1
+                    self.loadSignal.changeStatus(True)
+
+                processes = [engine.spawn(self.timed(engine, sequence))
+                             for sequence, bottle in zip(self.positionSequences, slots)
+                             if sequence is not None and bottle is not None]
+                for process in processes:
+                    yield process
+                yield self.SETTLE_TIME
+
+                if slots[0] is not None:
+                    self.loadSignal.changeStatus(False)
+                yield from self.timed(engine, self.rotary)
+                slots = [None] + slots[:-1]
+
+                if slots[-1] is not None:
+                    self.unloadSignal.changeStatus(True)
+                    self.completed += 1
+                    slots[-1] = None
+
+                self.elapsed = engine.now - start
+        finally:
+            for process in processes:
+                process.cancel()
+
+    def getReport(self) -> dict:
+        elapsed = self.elapsed if self.elapsed > 0 else 1.0
+        return {
+            "bottles": self.completed,
+            "elapsed": self.elapsed,
+            "bottlesPerMinute": self.completed / elapsed * 60,
+            "utilisation": {station: busy / elapsed for station, busy in sorted(self.busyTime.items())}
+        }
+
+    def getReportText(self) -> str:
+        report = self.getReport()
+        utilisation = ", ".join(f"{station} {value:.0%}" for station, value in report["utilisation"].items())
+        return f"{report['bottles']} bottles in {report['elapsed']:.1f}s, " \
+               f"{report['bottlesPerMinute']:.2f} bottles/min. Utilisation: {utilisation}"
+
+
+class SimulationJob:
+    QUEUED = "queued"
+    ACTIVE = "active"
+    DONE = "done"
+    CANCELLED = "cancelled"
+
+    def __init__(self, name: str, stations: tuple[str, ...], sequence):
+        self.name = name
+        self.stations = stations
+        self.sequence = sequence
+        self.state = self.QUEUED
+        self.process: SimulationProcess | None = None
+
+
+class SimulationScheduler(QThread):
+    """
+    Runs every station sequence on one thread. Jobs sharing a station run one after another in submission order,
+    jobs on different stations run concurrently on the same virtual clock.
+    """
+    sigJobsChanged = Signal()
+
+    MAX_QUEUED_JOBS = 64
+
+    def __init__(self, speed: float | None = 1.0):
+        """ speed as for SimulationEngine, None runs every job as fast as possible """
+        super().__init__()
+        if speed is not None and speed <= 0:
+            raise ValueError(f"speed must be positive, or None for as fast as possible, not {speed}")
+        self.speed = speed
+        self.engine = SimulationEngine(None)
+
+        self.cond = threading.Condition()
+        # (callable, argument) pairs to run on the scheduler thread
+        self.commands: list[tuple] = []
+
+        self.queuedJobs: list[SimulationJob] = []
+        self.activeJobs: list[SimulationJob] = []
+
+    def submitCompiled(self, sequence: CompiledSequence, name: str | None = None) -> SimulationJob | None:
+        return self.submit(name or sequence.name, sequence.stations, sequence.run())
+
+    def submitPipeline(self, pipeline: PipelinedLineSimulation, onFinished=None) -> SimulationJob | None:
+        """ onFinished is called on the scheduler thread once the last bottle left the line """
+        def runPipeline():
+            yield from pipeline.run(self.engine)
+            if onFinished is not None:
+                onFinished(pipeline)
+
+        return self.submit("pipeline", pipeline.getStations(), runPipeline())
+
+    def submit(self, name: str, stations, sequence) -> SimulationJob | None:
+        """ Queues a sequence on the given station(s), safe to call from any thread """
+        stations = (stations,) if isinstance(stations, str) else tuple(stations)
+        job = SimulationJob(name, stations, sequence)
+        with self.cond:
+            if len(self.queuedJobs) + len(self.commands) >= self.MAX_QUEUED_JOBS:
+                print(f"Simulation queue full, {name} dropped")
+                return None
+            self.commands.append((self.enqueue, job))
+            self.cond.notify()
+        return job
+
+    def cancel(self, job: SimulationJob):
+        with self.cond:
+            self.commands.append((self.cancelJob, job))
+            self.cond.notify()
+
+    def cancelAll(self):
+        with self.cond:
+            for job in self.queuedJobs + self.activeJobs:
+                self.commands.append((self.cancelJob, job))
+            self.cond.notify()
+
+    def getJobs(self) -> tuple[list[SimulationJob], list[SimulationJob]]:
+        """ Returns the active and queued jobs """
+        with self.cond:
+            return list(self.activeJobs), list(self.queuedJobs)
+
+    def enqueue(self, job: SimulationJob):
+        self.queuedJobs.append(job)
+        self.startRunnableJobs()
+
+    def cancelJob(self, job: SimulationJob):
+        if job.state == SimulationJob.QUEUED:
+            job.state = SimulationJob.CANCELLED
+            self.queuedJobs.remove(job)
+            self.sigJobsChanged.emit()
+        elif job.state == SimulationJob.ACTIVE:
+            job.process.cancel()
+
+    def startRunnableJobs(self):
+        busyStations = {station for job in self.activeJobs for station in job.stations}
+        for job in list(self.queuedJobs):
+            if busyStations.isdisjoint(job.stations):
+                self.queuedJobs.remove(job)
+                self.activeJobs.append(job)
+                job.state = SimulationJob.ACTIVE
+                job.process = self.engine.spawn(self.runJob(job), job.name)
+            # a waiting job keeps its stations reserved, later jobs can not overtake it
+            busyStations.update(job.stations)
+        self.sigJobsChanged.emit()
+
+    def runJob(self, job: SimulationJob):
+        try:
+            yield from job.sequence
+        finally:
+            with self.cond:
+                self.activeJobs.remove(job)
+                job.state = SimulationJob.CANCELLED if job.process.cancelled else SimulationJob.DONE
+                self.startRunnableJobs()
+
+    def run(self):
+        wallStart = time.monotonic()
+        while True:
+            with self.cond:
+                if len(self.commands) == 0:
+                    nextTime = self.engine.nextEventTime()
+                    if nextTime is None:
+                        self.cond.wait()
+                    elif self.speed is not None:
+                        self.cond.wait(max(wallStart + nextTime / self.speed - time.monotonic(), 0))
+                commands = self.commands
+                self.commands = []
+
+            if self.speed is None:
+                # nothing to wait for, commands are taken in once the running jobs are done
+                self.engine.run()
+            else:
+                # catch the virtual clock up with the wall clock before anything new is scheduled
+                self.engine.run(until=(time.monotonic() - wallStart) * self.speed)
+            for command, arg in commands:
+                with self.cond:
+                    command(arg)
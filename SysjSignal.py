@@ -1,11 +1,43 @@
+import collections
+import errno
+import heapq
+import http.server
+import itertools
 import json
-import os
 import queue
+import random
 import selectors
 import socket
+import struct
+import threading
 import time
 
-from PySide6.QtCore import QThread, Signal, QObject
+from PySide6.QtCore import QThread, Signal, QObject, QTimer
+
+FRAME_DELIMITER = b"\n"
+ONE_SHOT_PULSE_WIDTH = 0.2
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
+# a binary connection starts with this, the NUL byte can never start a JSON frame
+BINARY_MAGIC = b"\x00SJB"
+MSG_TABLE = 0
+MSG_STATE = 1
+MSG_STATE_INT = 2
+MSG_STATE_FLOAT = 3
+MSG_STATE_TEXT = 4
+# any other value, as JSON text
+MSG_STATE_JSON = 5
+TABLE_STRUCT = struct.Struct("<BI")
+STATE_STRUCT = struct.Struct("<BHB")
+STATE_INT_STRUCT = struct.Struct("<BHBq")
+STATE_FLOAT_STRUCT = struct.Struct("<BHBd")
+STATE_TEXT_STRUCT = struct.Struct("<BHBI")
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK))
 
 
 class MyEmitter(QObject):
@@ -72,71 +104,93 @@ class SignalBase:
 
 class OutputSignal(SignalBase):
 
-    def __init__(self, name, cd, port, ip="127.0.0.1", oneShot=False, initStatus=False, ignoreSocket=False):
+    def __init__(self, name, cd, port, ip="127.0.0.1", oneShot=False, initStatus=False, ignoreSocket=False,
+                 pulseWidth=ONE_SHOT_PULSE_WIDTH):
         super().__init__(name, cd, status=initStatus)
 
         self.socketInfo = SocketBaseInfo(ip, port)
         self.socket = None
         self.isOneShot = oneShot
+        self.pulseWidth = pulseWidth
 
         self.ignoreSocket = ignoreSocket
 
         self.emitter = MyEmitter()
+        self.manager = None
 
     def changeStatus(self, status: bool):
         self.status = status
         self.signalDto.status = status
         self.emitter.sigStatusChanged.emit(status)
 
+        if self.manager is not None:
+            self.manager.notifySignalChanged(self)
+
+    def setManager(self, manager):
+        self.manager = manager
+
     def setSocket(self, so):
         self.socket = so
 
     def isSocketAvailable(self):
         return self.socket is not None
 
-    def sendSignal(self):
-        if self.isSocketAvailable() and not self.ignoreSocket:
-            if self.isOneShot and self.status is False:
-                return
+    def isSendable(self):
+        if not self.isSocketAvailable() or self.ignoreSocket:
+            return False
 
-            self.socket.send(self.signalDto.toJson().encode())
+        # a one shot signal only goes on the wire while it is pulsed
+        return not (self.isOneShot and self.status is False)
 
-            if self.isOneShot:
-                time.sleep(0.2)
-                self.status = False
-                self.signalDto.status = False
-                self.signalDto.value = None
-                self.socket.send(self.signalDto.toJson().encode())
+    def writeFrame(self, buffer: bytearray):
+        buffer += self.signalDto.toJson().encode()
+        buffer += FRAME_DELIMITER
 
-        else:
-            # print(f"{self.name} is not connected to the server")
-            pass
+    def resetPulse(self):
+        self.status = False
+        self.signalDto.status = False
+        self.signalDto.value = None
 
 
-class InputSignal(SignalBase):
-    def __init__(self, name, cd, port, ip="127.0.0.1"):
-        super().__init__(name, cd)
-        self.socketInfo = SocketBaseInfo(ip, port)
+class SignalRegistry:
+    """ Interns (cd, name) pairs into ids and keeps what a received signal is dispatched to """
 
+    def __init__(self):
+        self.ids: dict[tuple[str, str], int] = {}
+        self.keys: list[tuple[str, str]] = []
+        self.lights: list = []
+        self.callbacks: list[list[tuple]] = []
 
-def createClientSocket(ip, port):
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        sock.settimeout(0.01)  # set 10ms to
-        sock.connect((ip, port))
-    except socket.timeout:
-        # print(f"{ip}:{port}, Connection timeout")
-        sock.close()
-        return None
-    except socket.error as e:
-        if e.errno == 61:
-            return None
+    def register(self, cd: str, name: str) -> int:
+        key = (cd, name)
+        sigId = self.ids.get(key)
+        if sigId is None:
+            sigId = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.lights.append(None)
+            self.callbacks.append([])
+        return sigId
 
-        print(f"{ip}:{port}, Connection Error: {e}")
-        sock.close()
-        return None
+    def idOf(self, cd: str, name: str) -> int | None:
+        return self.ids.get((cd, name))
 
-    return sock
+    def bindLight(self, signal: SignalBase, light):
+        self.lights[self.register(signal.cd, signal.name)] = light
+
+    def addCallback(self, signal: SignalBase, callback, data=None):
+        self.callbacks[self.register(signal.cd, signal.name)].append((callback, data))
+
+    def runCallbacks(self, sigId: int, trueCount: int):
+        # callbacks run once per received True, even if the receiver only saw the latest state
+        for _ in range(trueCount):
+            for callback, data in self.callbacks[sigId]:
+                callback(data)
+
+
+class InputSignal(SignalBase):
+    def __init__(self, name, cd, port, ip="127.0.0.1"):
+        super().__init__(name, cd)
+        self.socketInfo = SocketBaseInfo(ip, port)
 
 
 def createServerSocket(port):
@@ -153,46 +207,943 @@ def createServerSocket(port):
     return sock
 
 
-class OutputSignalManager(QThread):
+class SignalProtocolError(Exception):
+    pass
+
+
+class FrameTooLargeError(SignalProtocolError):
+    pass
+
+
+def parseJsonFrame(frame) -> SignalBase | None:
+    try:
+        jsDict = json.loads(frame)
+        sig = SignalBase(jsDict["name"], jsDict["cd"], jsDict["status"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    if jsDict.get("value") is not None:
+        sig.value = jsDict["value"]
+
+    return sig
+
+
+class BinaryFrameEncoder:
+    """ Sender side of the binary protocol, signal ids are only valid for one connection """
+
+    def __init__(self):
+        self.ids: dict[SignalBase, int] = {}
+
+    def writeHandshake(self, signals: list[SignalBase], buffer: bytearray):
+        self.ids.clear()
+        buffer += BINARY_MAGIC
+        self.writeTable(signals, buffer)
+
+    def writeTable(self, signals: list[SignalBase], buffer: bytearray):
+        newSignals = [signal for signal in signals if signal not in self.ids]
+        if len(newSignals) == 0:
+            return
+
+        for signal in newSignals:
+            self.ids[signal] = len(self.ids)
+        payload = json.dumps([[signal.cd, signal.name] for signal in newSignals]).encode()
+        buffer += TABLE_STRUCT.pack(MSG_TABLE, len(payload))
+        buffer += payload
+
+    def writeFrame(self, signal: SignalBase, buffer: bytearray):
+        if signal not in self.ids:
+            # registered after the handshake
+            self.writeTable([signal], buffer)
+
+        sigId = self.ids[signal]
+        status = signal.signalDto.status
+        value = signal.signalDto.value
+        if value is None:
+            buffer += STATE_STRUCT.pack(MSG_STATE, sigId, status)
+        elif isinstance(value, str):
+            text = value.encode()
+            buffer += STATE_TEXT_STRUCT.pack(MSG_STATE_TEXT, sigId, status, len(text))
+            buffer += text
+        elif isinstance(value, float):
+            buffer += STATE_FLOAT_STRUCT.pack(MSG_STATE_FLOAT, sigId, status, value)
+        elif isinstance(value, int) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX:
+            buffer += STATE_INT_STRUCT.pack(MSG_STATE_INT, sigId, status, value)
+        else:
+            # decoded with json.loads, so it arrives as the JSON protocol would deliver it
+            text = json.dumps(value).encode()
+            buffer += STATE_TEXT_STRUCT.pack(MSG_STATE_JSON, sigId, status, len(text))
+            buffer += text
+
+
+class BinaryFrameDecoder:
+    """ Receiver side of the binary protocol, consumes whole messages from the front of a buffer """
+
+    def __init__(self):
+        self.table: list[tuple[str, str]] = []
+        self.handshakeDone = False
+
+    @staticmethod
+    def parseTable(payload) -> list[tuple[str, str]]:
+        try:
+            entries = json.loads(payload)
+        except ValueError:
+            raise SignalProtocolError("malformed signal table")
+        if not isinstance(entries, list) or not all(
+                isinstance(entry, list) and len(entry) == 2 and all(isinstance(part, str) for part in entry)
+                for entry in entries):
+            raise SignalProtocolError("signal table entries must be [cd, name] pairs")
+        return [(cd, name) for cd, name in entries]
+
+    def decode(self, pending: bytearray, sizes: list[int] | None = None) -> list[SignalBase]:
+        """ sizes, when given, gets the message size of every returned signal """
+        signals = []
+        pos = 0
+        size = len(pending)
+
+        if not self.handshakeDone:
+            if size < len(BINARY_MAGIC):
+                return signals
+            if pending[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+                raise SignalProtocolError("missing binary handshake")
+            self.handshakeDone = True
+            pos = len(BINARY_MAGIC)
+
+        try:
+            while pos < size:
+                msgStart = pos
+                msgType = pending[pos]
+                if msgType == MSG_STATE:
+                    if size - pos < STATE_STRUCT.size:
+                        break
+                    _, sigId, status = STATE_STRUCT.unpack_from(pending, pos)
+                    pos += STATE_STRUCT.size
+                    value = None
+                elif msgType == MSG_STATE_INT or msgType == MSG_STATE_FLOAT:
+                    valueStruct = STATE_INT_STRUCT if msgType == MSG_STATE_INT else STATE_FLOAT_STRUCT
+                    if size - pos < valueStruct.size:
+                        break
+                    _, sigId, status, value = valueStruct.unpack_from(pending, pos)
+                    pos += valueStruct.size
+                elif msgType == MSG_STATE_TEXT or msgType == MSG_STATE_JSON:
+                    if size - pos < STATE_TEXT_STRUCT.size:
+                        break
+                    _, sigId, status, length = STATE_TEXT_STRUCT.unpack_from(pending, pos)
+                    end = pos + STATE_TEXT_STRUCT.size + length
+                    if size < end:
+                        break
+                    text = pending[pos + STATE_TEXT_STRUCT.size:end]
+                    try:
+                        value = text.decode() if msgType == MSG_STATE_TEXT else json.loads(text)
+                    except ValueError:
+                        raise SignalProtocolError(f"malformed value of signal id {sigId}")
+                    pos = end
+                elif msgType == MSG_TABLE:
+                    if size - pos < TABLE_STRUCT.size:
+                        break
+                    _, length = TABLE_STRUCT.unpack_from(pending, pos)
+                    end = pos + TABLE_STRUCT.size + length
+                    if size < end:
+                        break
+                    self.table += self.parseTable(pending[pos + TABLE_STRUCT.size:end])
+                    pos = end
+                    continue
+                else:
+                    raise SignalProtocolError(f"unknown message type {msgType}")
+
+                if sigId >= len(self.table):
+                    raise SignalProtocolError(f"unknown signal id {sigId}")
+                cd, name = self.table[sigId]
+                signals.append(SignalBase(name, cd, bool(status), value))
+                if sizes is not None:
+                    sizes.append(pos - msgStart)
+        finally:
+            del pending[:pos]
+
+        return signals
+
+
+class FrameReader:
+    """ Reassembles the frames of one connection across partial and coalesced reads """
+
+    RECV_SIZE = 65536
+    MAX_PENDING_BYTES = 1 << 20
 
     def __init__(self):
+        self.recvBuffer = bytearray(self.RECV_SIZE)
+        self.recvView = memoryview(self.recvBuffer)
+        # bytes of the frame that is still incomplete
+        self.pending = bytearray()
+
+        # decided by the first byte of the connection
+        self.protocol = None
+        self.binaryDecoder = None
+
+        # for metrics, endpoint is the local ip:port the connection was accepted on
+        self.endpoint: SocketBaseInfo | None = None
+        self.bytesRead = 0
+        self.parseFailures = 0
+        # wire bytes of each signal returned by the last read, only collected once set to a list
+        self.frameSizes: list[int] | None = None
+
+    def readFrom(self, conn: socket.socket) -> list[SignalBase] | None:
+        """ Returns the signals completed by this read, None when the peer closed the connection """
+        size = conn.recv_into(self.recvView)
+        if size == 0:
+            return None
+
+        self.pending += self.recvView[:size]
+        self.bytesRead += size
+        sizes = self.frameSizes
+        if sizes is not None:
+            sizes.clear()
+
+        if self.protocol is None:
+            if self.pending[0] == BINARY_MAGIC[0]:
+                self.protocol = PROTOCOL_BINARY
+                self.binaryDecoder = BinaryFrameDecoder()
+            else:
+                self.protocol = PROTOCOL_JSON
+
+        if self.protocol == PROTOCOL_BINARY:
+            signals = self.binaryDecoder.decode(self.pending, sizes)
+            if len(self.pending) > self.MAX_PENDING_BYTES:
+                raise FrameTooLargeError(f"incomplete message of {len(self.pending)} bytes")
+            return signals
+
+        signals = []
+        frames = self.takeFrames()
+        if sizes is not None:
+            # takeFrames filled in the size of every frame, keep those of the parsed ones
+            frameSizes = sizes[:]
+            sizes.clear()
+        for idx, frame in enumerate(frames):
+            sig = parseJsonFrame(frame)
+            if sig is not None:
+                signals.append(sig)
+                if sizes is not None:
+                    sizes.append(frameSizes[idx])
+            else:
+                self.parseFailures += 1
+        return signals
+
+    def takeFrames(self) -> list[bytes]:
+        pending = self.pending
+        frames = []
+
+        start = 0
+        while True:
+            end = pending.find(FRAME_DELIMITER, start)
+            if end < 0:
+                break
+            frame = bytes(pending[start:end]).strip()
+            if len(frame) > 0:
+                frames.append(frame)
+                if self.frameSizes is not None:
+                    self.frameSizes.append(end + 1 - start)
+            start = end + 1
+        del pending[:start]
+
+        # peers that do not terminate their last object with a newline
+        if pending[-1:] == b"}":
+            frames += self.takeUndelimitedObjects()
+
+        if len(pending) > self.MAX_PENDING_BYTES:
+            raise FrameTooLargeError(f"no frame delimiter in {len(pending)} bytes")
+
+        return frames
+
+    def takeUndelimitedObjects(self) -> list[bytes]:
+        try:
+            text = self.pending.decode()
+        except UnicodeDecodeError:
+            return []
+
+        decoder = json.JSONDecoder()
+        frames = []
+        idx = 0
+        try:
+            while True:
+                while idx < len(text) and text[idx].isspace():
+                    idx += 1
+                if idx == len(text):
+                    break
+                _, end = decoder.raw_decode(text, idx)
+                frames.append(text[idx:end].encode())
+                idx = end
+        except json.JSONDecodeError:
+            # a truncated object, wait for the rest of it
+            return []
+
+        if self.frameSizes is not None:
+            self.frameSizes += [len(frame) for frame in frames]
+
+        self.pending.clear()
+        return frames
+
+
+class LoopWakeup:
+    """ Self-pipe that lets other threads interrupt a selector loop """
+
+    def __init__(self, sel: selectors.BaseSelector):
+        self.reader, self.writer = socket.socketpair()
+        self.reader.setblocking(False)
+        self.writer.setblocking(False)
+        sel.register(self.reader, selectors.EVENT_READ, None)
+
+    def wakeup(self):
+        try:
+            self.writer.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            # the loop has a wakeup pending already
+            pass
+
+    def drain(self):
+        try:
+            while self.reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+
+class ScheduledAction:
+    def __init__(self, deadline: float, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerQueue:
+    """ Deadline ordered actions, run by the thread that owns the queue """
+
+    def __init__(self):
+        self.heap: list[tuple[float, int, ScheduledAction]] = []
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+
+    def schedule(self, delay: float, callback, *args) -> ScheduledAction:
+        action = ScheduledAction(time.monotonic() + delay, callback, args)
+        with self.lock:
+            heapq.heappush(self.heap, (action.deadline, next(self.seq), action))
+        return action
+
+    def nextDeadline(self) -> float | None:
+        with self.lock:
+            while len(self.heap) > 0 and self.heap[0][2].cancelled:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if len(self.heap) > 0 else None
+
+    def runDue(self, now: float):
+        while True:
+            with self.lock:
+                if len(self.heap) == 0 or self.heap[0][0] > now:
+                    return
+                _, _, action = heapq.heappop(self.heap)
+
+            if not action.cancelled:
+                action.callback(*action.args)
+
+
+class Histogram:
+    """ Durations in power of two microsecond buckets, quantiles are the upper bound of their bucket """
+
+    BUCKETS = 32
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        idx = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)
+        self.buckets[idx] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, fraction: float) -> float:
+        target = fraction * self.count
+        seen = 0
+        for idx, bucketCount in enumerate(self.buckets):
+            seen += bucketCount
+            if seen >= target and bucketCount > 0:
+                return min((1 << idx) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "p50": self.quantile(0.50),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class SignalMetrics:
+    """
+    Counters, histograms and gauges of the signal managers, each keyed by metric name and a label
+    (a signal as cd.name or an endpoint as ip:port). Managers only touch it once setMetrics was called,
+    without it the cost is a None check per message.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, dict[str, int]] = {}
+        self.histograms: dict[str, dict[str, Histogram]] = {}
+        # read when a snapshot is taken, each returns a number or a dict of label to number
+        self.gauges: dict[str, object] = {}
+        self.startTime = time.monotonic()
+
+    def count(self, metric: str, label: str = "", n: int = 1):
+        with self.lock:
+            counter = self.counters.setdefault(metric, {})
+            counter[label] = counter.get(label, 0) + n
+
+    def countMessages(self, direction: str, messages: list[tuple[SignalBase, SocketBaseInfo, int | None]]):
+        """ messages are (signal, endpoint, frame size), the size is None where it is not known """
+        with self.lock:
+            signalMessages = self.counters.setdefault(f"{direction}.signalMessages", {})
+            endpointMessages = self.counters.setdefault(f"{direction}.endpointMessages", {})
+            for signal, endpoint, size in messages:
+                signalLabel = f"{signal.cd}.{signal.name}"
+                endpointLabel = f"{endpoint.ip}:{endpoint.port}"
+                signalMessages[signalLabel] = signalMessages.get(signalLabel, 0) + 1
+                if size is not None:
+                    signalBytes = self.counters.setdefault(f"{direction}.signalBytes", {})
+                    signalBytes[signalLabel] = signalBytes.get(signalLabel, 0) + size
+                endpointMessages[endpointLabel] = endpointMessages.get(endpointLabel, 0) + 1
+
+    def observe(self, metric: str, seconds: float, label: str = ""):
+        with self.lock:
+            labels = self.histograms.setdefault(metric, {})
+            histogram = labels.get(label)
+            if histogram is None:
+                histogram = labels[label] = Histogram()
+            histogram.observe(seconds)
+
+    def addGauge(self, metric: str, read):
+        self.gauges[metric] = read
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counters = {metric: dict(labels) for metric, labels in self.counters.items()}
+            histograms = {metric: {label: histogram.snapshot() for label, histogram in labels.items()}
+                          for metric, labels in self.histograms.items()}
+
+        gauges = {}
+        for metric, read in list(self.gauges.items()):
+            try:
+                gauges[metric] = read()
+            except RuntimeError:
+                # the owning thread changed the container while it was read, skip it this time
+                continue
+
+        return {"uptime": time.monotonic() - self.startTime, "counters": counters, "histograms": histograms,
+                "gauges": gauges}
+
+    def toJson(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def toText(self) -> str:
+        """ One metric per line as name{label} value """
+        snapshot = self.snapshot()
+        lines = [f"uptime {snapshot['uptime']:.3f}"]
+
+        def labelled(metric, label):
+            return f'{metric}{{{label}}}' if label else metric
+
+        for metric, labels in sorted(snapshot["counters"].items()):
+            for label, value in sorted(labels.items()):
+                lines.append(f"{labelled(metric, label)} {value}")
+        for metric, labels in sorted(snapshot["histograms"].items()):
+            for label, stats in sorted(labels.items()):
+                for stat, value in stats.items():
+                    lines.append(f"{labelled(metric + '.' + stat, label)} {value:.6g}")
+        for metric, value in sorted(snapshot["gauges"].items()):
+            if isinstance(value, dict):
+                for label, labelValue in sorted(value.items()):
+                    lines.append(f"{labelled(metric, label)} {labelValue}")
+            else:
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """ Serves /metrics as text and /metrics.json on a local port from its own thread """
+
+    def __init__(self, metrics: SignalMetrics, port: int, host: str = "127.0.0.1"):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, contentType = metrics.toText(), "text/plain; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body, contentType = metrics.toJson(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", contentType)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"Metrics served on http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class EndpointConnection:
+    DISCONNECTED = 0
+    CONNECTING = 1
+    CONNECTED = 2
+
+    MIN_BACKOFF = 0.05
+    MAX_BACKOFF = 5.0
+    # a peer that stops reading is dropped, the full state is resent after reconnecting
+    MAX_PENDING_BYTES = 1 << 20
+
+    def __init__(self, socketInfo: SocketBaseInfo, protocol=PROTOCOL_JSON, metrics: SignalMetrics | None = None):
+        self.socketInfo = socketInfo
+        self.signals: list[OutputSignal] = []
+        self.encoder = BinaryFrameEncoder() if protocol == PROTOCOL_BINARY else None
+        self.metrics = metrics
+        self.label = f"{socketInfo.ip}:{socketInfo.port}"
+
+        self.state = self.DISCONNECTED
+        self.sock = None
+        self.backoff = self.MIN_BACKOFF
+        self.nextAttempt = 0.0
+        self.reconnectCount = 0
+
+        # frames waiting to be written, reused for every batch
+        self.sendBuffer = bytearray()
+
+    def startConnect(self, sel: selectors.BaseSelector, now: float):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        err = sock.connect_ex((self.socketInfo.ip, self.socketInfo.port))
+
+        self.sock = sock
+        if err not in CONNECT_IN_PROGRESS:
+            self.fail(sel, now)
+            return
+
+        self.state = self.CONNECTING
+        sel.register(sock, selectors.EVENT_WRITE, self)
+
+    def finishConnect(self, sel: selectors.BaseSelector, now: float) -> bool:
+        err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0:
+            self.fail(sel, now)
+            return False
+
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sel.modify(self.sock, selectors.EVENT_READ, self)
+
+        self.state = self.CONNECTED
+        self.backoff = self.MIN_BACKOFF
+        for signal in self.signals:
+            signal.setSocket(self.sock)
+
+        if self.encoder is not None:
+            self.encoder.writeHandshake(self.signals, self.sendBuffer)
+
+        print(f"Connected: {self.socketInfo.ip}:{self.socketInfo.port}")
+        if self.metrics is not None:
+            self.metrics.count("out.connects", self.label)
+        return True
+
+    def fail(self, sel: selectors.BaseSelector, now: float):
+        if self.sock is not None:
+            if self.state != self.DISCONNECTED:
+                sel.unregister(self.sock)
+            self.sock.close()
+            self.sock = None
+
+        if self.state == self.CONNECTED:
+            print(f"Disconnected: {self.socketInfo.ip}:{self.socketInfo.port}")
+            self.reconnectCount += 1
+            if self.metrics is not None:
+                self.metrics.count("out.reconnects", self.label)
+
+        self.state = self.DISCONNECTED
+        self.sendBuffer.clear()
+        for signal in self.signals:
+            signal.setSocket(None)
+
+        # exponential backoff with jitter, so endpoints that are down do not retry in lockstep
+        self.nextAttempt = now + self.backoff * random.uniform(0.5, 1.0)
+        self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
+
+    def writeFrame(self, signal: OutputSignal):
+        if self.encoder is not None:
+            self.encoder.writeFrame(signal, self.sendBuffer)
+        else:
+            signal.writeFrame(self.sendBuffer)
+
+    def flush(self, sel: selectors.BaseSelector, now: float):
+        if self.state != self.CONNECTED:
+            self.sendBuffer.clear()
+            return
+
+        try:
+            if len(self.sendBuffer) > 0:
+                sent = self.sock.send(self.sendBuffer)
+                del self.sendBuffer[:sent]
+                if self.metrics is not None:
+                    self.metrics.count("out.endpointBytes", self.label, sent)
+        except (BlockingIOError, InterruptedError):
+            pass
+        except socket.error as e:
+            print(f"Error: {e}")
+            self.fail(sel, now)
+            return
+
+        if len(self.sendBuffer) > self.MAX_PENDING_BYTES:
+            self.fail(sel, now)
+            return
+
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if len(self.sendBuffer) > 0 else selectors.EVENT_READ
+        if sel.get_key(self.sock).events != events:
+            sel.modify(self.sock, events, self)
+
+    def handleEvent(self, sel: selectors.BaseSelector, mask: int, now: float) -> bool:
+        """ Returns True when the endpoint has just connected """
+        if self.state == self.CONNECTING:
+            return self.finishConnect(sel, now)
+
+        if mask & selectors.EVENT_READ:
+            # controllers do not talk back on this socket, only watch for the peer closing it
+            try:
+                data = self.sock.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                data = None
+            except socket.error:
+                data = b""
+
+            if data == b"":
+                self.fail(sel, now)
+                return False
+
+        if mask & selectors.EVENT_WRITE:
+            self.flush(sel, now)
+
+        return False
+
+
+class OutputSignalManager(QThread):
+
+    def __init__(self, keepaliveInterval: float | None = None, protocol=PROTOCOL_JSON):
         super().__init__()
         self.registeredSignal: queue.Queue[OutputSignal] = queue.Queue()
+        self.changedSignal: queue.Queue[OutputSignal] = queue.Queue()
+        # (signal, status, value) frames from enqueueFrame, written in order
+        self.queuedFrames: collections.deque[tuple[OutputSignal, bool, object]] = collections.deque()
+
+        # resend the full state of every signal at this interval (seconds), None to disable
+        self.keepaliveInterval = keepaliveInterval
+        # PROTOCOL_BINARY for peers that understand it, InputSignalManager detects it per connection
+        self.protocol = protocol
+
+        self.outputSignalSet: set[OutputSignal] = set()
+        self.endpoints: dict[SocketBaseInfo, EndpointConnection] = {}
+
+        self.timers = TimerQueue()
+        self.pendingPulseResets: dict[OutputSignal, ScheduledAction] = {}
+
+        self.sel = selectors.DefaultSelector()
+        # wakes the loop up when a signal is registered or changed
+        self.loopWakeup = LoopWakeup(self.sel)
+
+        self.metrics: SignalMetrics | None = None
+        # when each dirty signal first changed, only kept while metrics are enabled
+        self.changeTimes: dict[OutputSignal, float] = {}
+        # SignalRecording.SignalRecorder, logs every frame written to an endpoint when set
+        self.recorder = None
+
+    def setMetrics(self, metrics: SignalMetrics):
+        """ Call before start() """
+        self.metrics = metrics
+        metrics.addGauge("out.changedQueue", self.changedSignal.qsize)
+        metrics.addGauge("out.timers", lambda: len(self.timers.heap))
+        metrics.addGauge("out.sendBufferBytes",
+                         lambda: {endpoint.label: len(endpoint.sendBuffer) for endpoint in list(self.endpoints.values())})
+
+    def setRecorder(self, recorder):
+        self.recorder = recorder
 
     def addSignal(self, signal: OutputSignal):
-        self.registeredSignal.put(signal)
+        self.addSignals([signal])
+
+    def addSignals(self, signals):
+        for signal in signals:
+            signal.setManager(self)
+            self.registeredSignal.put(signal)
+        self.wakeup()
+
+    def isSignalLive(self, signal: OutputSignal) -> bool:
+        endpoint = self.endpoints.get(signal.socketInfo)
+        return signal in self.outputSignalSet and endpoint is not None and \
+            endpoint.state == EndpointConnection.CONNECTED
+
+    def notifySignalChanged(self, signal: OutputSignal):
+        if self.metrics is not None:
+            self.changeTimes.setdefault(signal, time.monotonic())
+        self.changedSignal.put(signal)
+        self.wakeup()
+
+    def enqueueFrame(self, signal: OutputSignal, status: bool, value=None):
+        """
+        Sends this state of a registered signal as a frame of its own, in order with every other enqueued frame.
+        Unlike changeStatus nothing is coalesced, and frames for an endpoint that is not connected are dropped.
+        Safe to call from any thread.
+        """
+        self.queuedFrames.append((signal, status, value))
+        self.wakeup()
+
+    def hasQueuedFrames(self) -> bool:
+        return len(self.queuedFrames) > 0
+
+    def callLater(self, delay: float, callback, *args) -> ScheduledAction:
+        """ Run callback on the manager thread after delay seconds, safe to call from any thread """
+        action = self.timers.schedule(delay, callback, *args)
+        self.wakeup()
+        return action
+
+    def wakeup(self):
+        self.loopWakeup.wakeup()
+
+    def nextTimeout(self, now: float, lastKeepalive: float) -> float | None:
+        """ Seconds until the loop has work of its own, None to sleep until woken up """
+        deadlines = [endpoint.nextAttempt for endpoint in self.endpoints.values()
+                     if endpoint.state == EndpointConnection.DISCONNECTED]
+        if self.keepaliveInterval is not None:
+            deadlines.append(lastKeepalive + self.keepaliveInterval)
+        timerDeadline = self.timers.nextDeadline()
+        if timerDeadline is not None:
+            deadlines.append(timerDeadline)
+
+        if len(deadlines) == 0:
+            return None
+        return max(min(deadlines) - now, 0)
 
     def run(self) -> None:
-        socketInfoMap = {}
-        outputSignalSet: set[OutputSignal] = set()
+        outputSignalSet = self.outputSignalSet
+        # insertion ordered, only the latest state of a signal is sent
+        dirtySignals: dict[OutputSignal, None] = {}
+        lastKeepalive = time.monotonic()
 
         while True:
-            time.sleep(0.25)
-            # check if there is any new signal
-            if not self.registeredSignal.empty():
-                signal = self.registeredSignal.get()
-                if signal not in outputSignalSet:
-                    outputSignalSet.add(signal)
+            events = self.sel.select(self.nextTimeout(time.monotonic(), lastKeepalive))
+            loopStart = time.monotonic()
+            for key, mask in events:
+                endpoint = key.data
+                if endpoint is None:
+                    self.loopWakeup.drain()
+                elif endpoint.handleEvent(self.sel, mask, time.monotonic()):
+                    # the controller has not seen any state yet, send everything on this socket
+                    for signal in endpoint.signals:
+                        dirtySignals[signal] = None
+
+            self.timers.runDue(time.monotonic())
 
-            for signal in outputSignalSet:
-                if signal.socketInfo not in socketInfoMap:
-                    newSocket = createClientSocket(signal.socketInfo.ip, signal.socketInfo.port)
-                    if newSocket is not None:
-                        socketInfoMap[signal.socketInfo] = newSocket
-                        signal.setSocket(socketInfoMap[signal.socketInfo])
-                        time.sleep(0.5)
+            try:
+                while True:
+                    dirtySignals[self.changedSignal.get_nowait()] = None
+            except queue.Empty:
+                pass
+
+            # take every signal registered since the last iteration
+            try:
+                while True:
+                    signal = self.registeredSignal.get_nowait()
+                    if signal in outputSignalSet:
                         continue
-                else:
-                    if not signal.isSocketAvailable():
-                        signal.setSocket(socketInfoMap[signal.socketInfo])
 
-                try:
-                    signal.sendSignal()
-                except socket.error as e:
-                    print(f"Error: {e}")
-                    signal.socket.close()
-                    socketInfoMap.pop(signal.socketInfo)
-                    signal.setSocket(None)
+                    outputSignalSet.add(signal)
+                    if signal.socketInfo not in self.endpoints:
+                        self.endpoints[signal.socketInfo] = EndpointConnection(signal.socketInfo, self.protocol,
+                                                                               self.metrics)
+                    endpoint = self.endpoints[signal.socketInfo]
+                    endpoint.signals.append(signal)
+                    signal.setSocket(endpoint.sock if endpoint.state == EndpointConnection.CONNECTED else None)
+                    dirtySignals[signal] = None
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for endpoint in self.endpoints.values():
+                if endpoint.state == EndpointConnection.DISCONNECTED and now >= endpoint.nextAttempt:
+                    endpoint.startConnect(self.sel, now)
+
+            if self.keepaliveInterval is not None and now - lastKeepalive >= self.keepaliveInterval:
+                lastKeepalive = now
+                for signal in outputSignalSet:
+                    dirtySignals[signal] = None
+
+            self.flushSignals([signal for signal in dirtySignals if signal in outputSignalSet])
+            dirtySignals.clear()
+            self.writeQueuedFrames()
+
+            if self.metrics is not None:
+                self.metrics.observe("out.loopTime", time.monotonic() - loopStart)
+
+    def flushSignals(self, signals: list[OutputSignal]):
+        sendableSignals = [signal for signal in signals if signal.isSendable()]
+        if self.metrics is not None and len(sendableSignals) < len(signals):
+            # a change that is not sent ends here, a later send must not count it as latency
+            for signal in signals:
+                if not signal.isSendable():
+                    self.changeTimes.pop(signal, None)
+        self.writeBatches(sendableSignals)
+
+        for signal in sendableSignals:
+            if signal.isOneShot:
+                pendingReset = self.pendingPulseResets.get(signal)
+                if pendingReset is not None:
+                    # pulsed again before the previous pulse ended, stretch it
+                    pendingReset.cancel()
+                self.pendingPulseResets[signal] = self.timers.schedule(signal.pulseWidth, self.endPulse, signal)
+
+    def endPulse(self, signal: OutputSignal):
+        self.pendingPulseResets.pop(signal, None)
+        signal.resetPulse()
+        if signal.isSocketAvailable():
+            self.writeBatches([signal])
+
+    def writeQueuedFrames(self):
+        queuedFrames = self.queuedFrames
+        batchEndpoints: dict[SocketBaseInfo, EndpointConnection] = {}
+        while len(queuedFrames) > 0:
+            signal, status, value = queuedFrames[0]
+            endpoint = self.endpoints.get(signal.socketInfo)
+            if endpoint is None:
+                # registered, but not taken in by the loop yet
+                break
+            if endpoint.state == EndpointConnection.CONNECTED and \
+                    len(endpoint.sendBuffer) >= EndpointConnection.MAX_PENDING_BYTES // 2:
+                # continue once the socket took some of it, the loop wakes up when it is writable
+                break
+
+            queuedFrames.popleft()
+            if endpoint.state != EndpointConnection.CONNECTED:
+                continue
+            signal.status = signal.signalDto.status = status
+            signal.signalDto.value = value
+            endpoint.writeFrame(signal)
+            if self.recorder is not None:
+                self.recorder.recordOutput(signal)
+            batchEndpoints[signal.socketInfo] = endpoint
+
+        now = time.monotonic()
+        for endpoint in batchEndpoints.values():
+            endpoint.flush(self.sel, now)
+
+    def writeBatches(self, signals: list[OutputSignal]):
+        # one newline delimited batch per endpoint, built in the endpoint's reusable buffer
+        batchEndpoints: dict[SocketBaseInfo, EndpointConnection] = {}
+        metrics = self.metrics
+        recorder = self.recorder
+        messages = []
+        for signal in signals:
+            endpoint = self.endpoints[signal.socketInfo]
+            if metrics is None:
+                endpoint.writeFrame(signal)
+            else:
+                size = len(endpoint.sendBuffer)
+                endpoint.writeFrame(signal)
+                messages.append((signal, signal.socketInfo, len(endpoint.sendBuffer) - size))
+            # the frames that go on the wire, not every change made to the signals
+            if recorder is not None:
+                recorder.recordOutput(signal)
+            batchEndpoints[signal.socketInfo] = endpoint
+
+        now = time.monotonic()
+        if metrics is not None:
+            metrics.countMessages("out", messages)
+            # from the signal changing to its frame being handed to the socket
+            for signal in signals:
+                changedAt = self.changeTimes.pop(signal, None)
+                if changedAt is not None:
+                    metrics.observe("out.sendLatency", now - changedAt)
+        for endpoint in batchEndpoints.values():
+            endpoint.flush(self.sel, now)
+
+
+class SignalCoalescer(QObject):
+    """
+    Keeps only the latest state per signal between GUI ticks and hands them over as one batch.
+    Each batch entry is (signal, trueCount), trueCount being how many True states were received for it
+    since the last tick, so edge triggered callbacks can still run once per message.
+    """
+    sigBatchReady = Signal(list)
+
+    def __init__(self, intervalMs=33, parent=None):
+        super().__init__(parent)
+        self.lock = threading.Lock()
+        self.pending: dict[tuple, list] = {}
+        self.passThroughSeq = itertools.count()
+
+        # per (cd, name), how many received states never reached the GUI
+        self.collapsedCounts: dict[tuple[str, str], int] = {}
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(intervalMs)
+
+    def push(self, sig: SignalBase):
+        """ Called from the receiving thread """
+        trueCount = 1 if sig.status else 0
+        with self.lock:
+            if sig.value is not None:
+                # every value carries its own data (e.g. POS progress), never merge them
+                self.pending[(sig.cd, sig.name, next(self.passThroughSeq))] = [sig, trueCount]
+                return
+
+            key = (sig.cd, sig.name)
+            entry = self.pending.get(key)
+            if entry is None:
+                self.pending[key] = [sig, trueCount]
+            else:
+                entry[0] = sig
+                entry[1] += trueCount
+                self.collapsedCounts[key] = self.collapsedCounts.get(key, 0) + 1
+
+    def flush(self):
+        """ Called by the timer on the GUI thread """
+        with self.lock:
+            if len(self.pending) == 0:
+                return
+            pending = self.pending
+            self.pending = {}
+
+        self.sigBatchReady.emit([(sig, trueCount) for sig, trueCount in pending.values()])
+
+    def snapshotCollapsedCounts(self) -> dict[tuple[str, str], int]:
+        with self.lock:
+            return dict(self.collapsedCounts)
 
 
 class InputSignalManager(QThread):
@@ -204,57 +1155,125 @@ class InputSignalManager(QThread):
 
         self.servSocks = []
         self.recordSockInfoSet: set[SocketBaseInfo] = set()
+        self.frameReaders: dict[socket.socket, FrameReader] = {}
+        # when set, received signals go through it instead of one recvSignal per message
+        self.coalescer: SignalCoalescer | None = None
 
         self.sel = selectors.DefaultSelector()
+        # wakes the loop up when a signal is registered
+        self.loopWakeup = LoopWakeup(self.sel)
+
+        self.metrics: SignalMetrics | None = None
+        # SignalRecording.SignalRecorder, logs every received signal when set
+        self.recorder = None
 
     def addSignal(self, signal: InputSignal):
-        self.registeredSignal.put(signal)
+        self.addSignals([signal])
+
+    def addSignals(self, signals):
+        for signal in signals:
+            self.registeredSignal.put(signal)
+        self.loopWakeup.wakeup()
+
+    def setCoalescer(self, coalescer: SignalCoalescer):
+        self.coalescer = coalescer
+
+    def setMetrics(self, metrics: SignalMetrics):
+        """ Call before start() """
+        self.metrics = metrics
+        metrics.addGauge("in.registeredQueue", self.registeredSignal.qsize)
+        metrics.addGauge("in.connections", lambda: len(self.frameReaders))
+        metrics.addGauge("in.coalescerPending", lambda: len(self.coalescer.pending) if self.coalescer else 0)
+
+    def setRecorder(self, recorder):
+        self.recorder = recorder
 
     @staticmethod
     def readClientData(inputSigMngr, conn):
-        data = conn.recv(1024)
-        if not data:
-            print(f"Connection closed")
-        else:
-            print(f"Received: {data}")
-
-            dataStr = data.decode()
+        reader = inputSigMngr.frameReaders[conn]
+        metrics = inputSigMngr.metrics
+        if metrics is not None:
+            readStart = time.monotonic()
+            bytesRead, parseFailures = reader.bytesRead, reader.parseFailures
+        try:
+            signals = reader.readFrom(conn)
+        except (BlockingIOError, InterruptedError):
+            return
+        except (socket.error, SignalProtocolError) as e:
+            print(f"Error: {e}")
+            if metrics is not None and isinstance(e, SignalProtocolError):
+                metrics.count("in.protocolErrors", f"{reader.endpoint.ip}:{reader.endpoint.port}")
+            signals = None
 
-            for oneStr in dataStr.split(os.linesep):
-                try:
-                    jsDict = json.loads(oneStr)
-                    sig = SignalBase(jsDict["name"], jsDict["cd"], jsDict["status"])
+        if signals is None:
+            print(f"Connection closed")
+            inputSigMngr.closeConnection(conn)
+            return
 
-                    if jsDict.get("value") is not None:
-                        sig.value = jsDict["value"]
+        recorder = inputSigMngr.recorder
+        if recorder is not None:
+            for sig in signals:
+                recorder.recordInput(sig, reader.endpoint)
 
-                    inputSigMngr.recvSignal.emit(sig)
+        coalescer = inputSigMngr.coalescer
+        for sig in signals:
+            if coalescer is not None:
+                coalescer.push(sig)
+            else:
+                inputSigMngr.recvSignal.emit(sig)
 
-                except json.JSONDecodeError:
-                    continue
+        if metrics is not None:
+            endpointLabel = f"{reader.endpoint.ip}:{reader.endpoint.port}"
+            metrics.count("in.endpointBytes", endpointLabel, reader.bytesRead - bytesRead)
+            if reader.parseFailures != parseFailures:
+                metrics.count("in.parseFailures", endpointLabel, reader.parseFailures - parseFailures)
+            metrics.countMessages("in", [(sig, reader.endpoint, size) for sig, size in zip(signals, reader.frameSizes)])
+            # from the bytes being read to their signals being handed on
+            metrics.observe("in.receiveLatency", time.monotonic() - readStart)
 
     @staticmethod
     def acceptedConnection(inputSigMngr, sock):
         conn, addr = sock.accept()
         print(f"Connection from {addr}")
         conn.setblocking(False)
+        reader = inputSigMngr.frameReaders[conn] = FrameReader()
+        reader.endpoint = SocketBaseInfo(*sock.getsockname()[:2])
+        if inputSigMngr.metrics is not None:
+            reader.frameSizes = []
         inputSigMngr.sel.register(conn, selectors.EVENT_READ, inputSigMngr.readClientData)
 
+    def closeConnection(self, conn):
+        self.sel.unregister(conn)
+        self.frameReaders.pop(conn, None)
+        conn.close()
+
+    def isSignalLive(self, signal: InputSignal) -> bool:
+        return signal.socketInfo in self.recordSockInfoSet
+
     def run(self) -> None:
         while True:
-            time.sleep(0.25)
-            if not self.registeredSignal.empty():
-                signal = self.registeredSignal.get()
-                sockInfo = signal.socketInfo
-                if sockInfo not in self.recordSockInfoSet:
-                    newSock = createServerSocket(sockInfo.port)
-                    if newSock is not None:
-                        print(f"Server socket created: {sockInfo.ip}:{sockInfo.port}")
-                        self.servSocks.append(newSock)
-                        self.recordSockInfoSet.add(sockInfo)
-                        self.sel.register(newSock, selectors.EVENT_READ, self.acceptedConnection)
-
-            if len(self.servSocks) > 0:
-                for key, mask in self.sel.select(timeout=1):
-                    callback = key.data
+            events = self.sel.select()
+            loopStart = time.monotonic()
+            for key, mask in events:
+                callback = key.data
+                if callback is None:
+                    self.loopWakeup.drain()
+                else:
                     callback(self, key.fileobj)
+
+            # take every signal registered since the last iteration
+            try:
+                while True:
+                    sockInfo = self.registeredSignal.get_nowait().socketInfo
+                    if sockInfo not in self.recordSockInfoSet:
+                        newSock = createServerSocket(sockInfo.port)
+                        if newSock is not None:
+                            print(f"Server socket created: {sockInfo.ip}:{sockInfo.port}")
+                            self.servSocks.append(newSock)
+                            self.recordSockInfoSet.add(sockInfo)
+                            self.sel.register(newSock, selectors.EVENT_READ, self.acceptedConnection)
+            except queue.Empty:
+                pass
+
+            if self.metrics is not None:
+                self.metrics.observe("in.loopTime", time.monotonic() - loopStart)
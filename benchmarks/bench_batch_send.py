@@ -0,0 +1,98 @@
+"""
+Compare the old per-signal send path against the coalesced per-socket batch.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch_send [rounds]
+"""
+import selectors
+import socket
+import sys
+import threading
+import time
+
+from SysjSignal import EndpointConnection, OutputSignal, OutputSignalManager
+
+CAPPER_SIGNALS = ["bottleAtPos4", "gripperZAxisLowered", "gripperZAxisLifted",
+                  "gripperTurnHomePos", "gripperTurnFinalPos", "capperDoProcess"]
+
+
+def startSink():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    received = [0]
+    done = threading.Event()
+
+    def drain():
+        conn, _ = server.accept()
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                break
+            received[0] += len(data)
+        conn.close()
+        server.close()
+        done.set()
+
+    threading.Thread(target=drain, daemon=True).start()
+    return server.getsockname()[1], received, done
+
+
+def connectSink(port):
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def perSignalPath(signals, sock, rounds):
+    syscalls = 0
+    for i in range(rounds):
+        for signal in signals:
+            signal.signalDto.status = i % 2 == 0
+            sock.send(signal.signalDto.toJson().encode())
+            syscalls += 1
+    return syscalls
+
+
+def batchPath(signals, sock, rounds):
+    manager = OutputSignalManager()
+    endpoint = EndpointConnection(signals[0].socketInfo)
+    endpoint.sock = sock
+    endpoint.state = EndpointConnection.CONNECTED
+    manager.sel.register(sock, selectors.EVENT_READ, endpoint)
+    manager.endpoints[endpoint.socketInfo] = endpoint
+    for signal in signals:
+        signal.setSocket(sock)
+
+    syscalls = 0
+    for i in range(rounds):
+        for signal in signals:
+            signal.signalDto.status = i % 2 == 0
+        manager.writeBatches(signals)
+        syscalls += 1
+        while len(endpoint.sendBuffer) > 0:
+            endpoint.flush(manager.sel, time.monotonic())
+            syscalls += 1
+    return syscalls
+
+
+def runOne(name, path, rounds):
+    port, received, done = startSink()
+    sock = connectSink(port)
+    signals = [OutputSignal(sigName, "CapperControllerCD", port) for sigName in CAPPER_SIGNALS]
+
+    start = time.perf_counter()
+    syscalls = path(signals, sock, rounds)
+    sock.close()
+    done.wait()
+    elapsed = time.perf_counter() - start
+    sentBytes = received[0]
+
+    print(f"{name:<12} rounds={rounds} syscalls={syscalls} bytes={sentBytes} "
+          f"time={elapsed:.3f}s syscalls/s={syscalls / elapsed:,.0f} MB/s={sentBytes / elapsed / 1e6:.2f}")
+
+
+if __name__ == '__main__':
+    benchRounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    runOne("per-signal", perSignalPath, benchRounds)
+    runOne("batched", batchPath, benchRounds)
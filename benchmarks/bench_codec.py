@@ -0,0 +1,63 @@
+"""
+Encode/decode cost and wire size of the JSON and binary signal protocols.
+
+Run from the repository root:
+    python -m benchmarks.bench_codec [messages]
+"""
+import sys
+import time
+
+from SysjSignal import BinaryFrameDecoder, BinaryFrameEncoder, FrameReader, OutputSignal, parseJsonFrame
+
+
+def createSignals():
+    signals = [OutputSignal(f"bottleAtPos2{idx}", f"Filler{idx}ControllerCD", 40002) for idx in "ABCD"]
+    signals += [OutputSignal(name, "CapperControllerCD", 40006)
+                for name in ("bottleAtPos4", "gripperZAxisLowered", "gripperZAxisLifted")]
+    return signals
+
+
+def benchJson(signals, count):
+    buffer = bytearray()
+    start = time.perf_counter()
+    for i in range(count):
+        signal = signals[i % len(signals)]
+        signal.signalDto.status = i % 2 == 0
+        signal.writeFrame(buffer)
+    encodeTime = time.perf_counter() - start
+    size = len(buffer)
+
+    reader = FrameReader()
+    reader.pending = buffer
+    start = time.perf_counter()
+    decoded = [parseJsonFrame(frame) for frame in reader.takeFrames()]
+    decodeTime = time.perf_counter() - start
+    assert len(decoded) == count
+    return encodeTime, decodeTime, size
+
+
+def benchBinary(signals, count):
+    encoder = BinaryFrameEncoder()
+    buffer = bytearray()
+    encoder.writeHandshake(signals, buffer)
+    start = time.perf_counter()
+    for i in range(count):
+        signal = signals[i % len(signals)]
+        signal.signalDto.status = i % 2 == 0
+        encoder.writeFrame(signal, buffer)
+    encodeTime = time.perf_counter() - start
+    size = len(buffer)
+
+    start = time.perf_counter()
+    decoded = BinaryFrameDecoder().decode(buffer)
+    decodeTime = time.perf_counter() - start
+    assert len(decoded) == count
+    return encodeTime, decodeTime, size
+
+
+if __name__ == '__main__':
+    messageCount = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for name, bench in (("json", benchJson), ("binary", benchBinary)):
+        encTime, decTime, wireSize = bench(createSignals(), messageCount)
+        print(f"{name:<7} messages={messageCount} bytes/msg={wireSize / messageCount:.1f} "
+              f"encode={encTime / messageCount * 1e9:,.0f} ns/msg decode={decTime / messageCount * 1e9:,.0f} ns/msg")
@@ -0,0 +1,260 @@
+"""
+Load and latency of both signal managers against fake SysJ controllers.
+
+The controllers run in a child process: listeners on the output ports (40000-40006) and senders into the
+input ports (41000-41006, 51000). This process runs the managers with the signals of the line and toggles
+output signals at the same rate. Every frame carries its send time, so both directions report end-to-end
+latency. CPU and memory are reported for this process, which holds both managers.
+
+Each run is appended to benchmarks/results/load.jsonl with the commit it ran on.
+
+Run from the repository root:
+    python -m benchmarks.bench_load [--rate 1000] [--duration 5] [--fragment 0] [--protocol json|binary]
+    python -m benchmarks.bench_load --history
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from PySide6.QtCore import QCoreApplication, Qt
+
+from LineSignals import createLineStations
+from SysjSignal import InputSignal, InputSignalManager, OutputSignal, OutputSignalManager, SignalBase, \
+    SignalMetrics, PROTOCOL_JSON, PROTOCOL_BINARY
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), "results", "load.jsonl")
+POS_INPUT_PORT = 51000
+
+
+def createSignals(portOffset: int):
+    """ The line's sendable output signals per port and every input signal, moved by portOffset """
+    outputsByPort: dict[int, list[OutputSignal]] = {}
+    inputsByPort: dict[int, list[InputSignal]] = {}
+
+    for station in createLineStations().values():
+        for sig in station.oSig:
+            if not sig.ignoreSocket and not sig.isOneShot:
+                port = sig.socketInfo.port + portOffset
+                outputsByPort.setdefault(port, []).append(OutputSignal(sig.name, sig.cd, port))
+        for sig in station.iSig:
+            port = sig.socketInfo.port + portOffset
+            inputsByPort.setdefault(port, []).append(InputSignal(sig.name, sig.cd, port))
+    inputsByPort[POS_INPUT_PORT + portOffset] = [InputSignal("POS", "POS", POS_INPUT_PORT + portOffset)]
+
+    return outputsByPort, inputsByPort
+
+
+def runControllers(listenPorts, senderTargets, rate, fragment, duration, ready, go, results):
+    from benchmarks.fake_controllers import ControllerListeners, ControllerSenders
+
+    listeners = ControllerListeners(listenPorts)
+    listeners.start()
+    ready.set()
+
+    go.wait()
+    senders = ControllerSenders(senderTargets, rate, fragment)
+    senders.connect()
+    senders.run(duration)
+    # frames still in flight from the managers
+    time.sleep(0.5)
+    senders.close()
+    listeners.stop()
+
+    results.put({"outputFrames": listeners.frames, "outputLatencies": listeners.latencies,
+                 "inputSent": senders.sent})
+
+
+def percentile(sortedValues: list, fraction: float):
+    if len(sortedValues) == 0:
+        return None
+    return sortedValues[min(int(fraction * len(sortedValues)), len(sortedValues) - 1)]
+
+
+def latencySummary(latenciesNs: list[int]) -> dict:
+    values = sorted(latenciesNs)
+    toMs = lambda ns: None if ns is None else ns / 1e6
+    return {"p50Ms": toMs(percentile(values, 0.50)), "p99Ms": toMs(percentile(values, 0.99)),
+            "maxMs": toMs(values[-1] if values else None)}
+
+
+def getCommit() -> tuple[str | None, bool]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip() != ""
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+
+def driveOutputs(outputsByPort: dict[int, list[OutputSignal]], rate: float, duration: float) -> int:
+    interval = 1 / rate if rate > 0 else 0
+    portSignals = list(outputsByPort.values())
+    start = time.monotonic()
+    end = start + duration
+
+    tick = 0
+    changed = 0
+    while time.monotonic() < end:
+        for signals in portSignals:
+            sig = signals[tick % len(signals)]
+            sig.signalDto.value = time.monotonic_ns()
+            sig.changeStatus(not sig.status)
+            changed += 1
+        tick += 1
+
+        if interval > 0:
+            wait = start + tick * interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+    return changed
+
+
+def runBenchmark(args) -> dict:
+    outputsByPort, inputsByPort = createSignals(args.port_offset)
+    senderTargets = [(port, [(sig.name, sig.cd) for sig in signals]) for port, signals in inputsByPort.items()]
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, go, results = ctx.Event(), ctx.Event(), ctx.Queue()
+    controllers = ctx.Process(target=runControllers, args=(list(outputsByPort), senderTargets, args.rate,
+                                                           args.fragment, args.duration, ready, go, results))
+    controllers.start()
+    ready.wait()
+
+    inputLatencies = []
+
+    def onSignal(sig: SignalBase):
+        inputLatencies.append(time.monotonic_ns() - sig.value)
+
+    outputMngr = OutputSignalManager(protocol=args.protocol)
+    inputMngr = InputSignalManager()
+    inputMngr.recvSignal.connect(onSignal, Qt.ConnectionType.DirectConnection)
+    metrics = None
+    if args.metrics:
+        metrics = SignalMetrics()
+        outputMngr.setMetrics(metrics)
+        inputMngr.setMetrics(metrics)
+    for signals in outputsByPort.values():
+        outputMngr.addSignals(signals)
+    for signals in inputsByPort.values():
+        inputMngr.addSignals(signals)
+    outputMngr.start()
+    inputMngr.start()
+
+    allOutputs = [sig for signals in outputsByPort.values() for sig in signals]
+    allInputs = [signals[0] for signals in inputsByPort.values()]
+    while not (all(outputMngr.isSignalLive(sig) for sig in allOutputs) and
+               all(inputMngr.isSignalLive(sig) for sig in allInputs)):
+        time.sleep(0.01)
+
+    cpuStart = time.process_time()
+    wallStart = time.monotonic()
+    go.set()
+    outputChanged = driveOutputs(outputsByPort, args.rate, args.duration)
+    controllerResults = results.get()
+    wall = time.monotonic() - wallStart
+    cpu = time.process_time() - cpuStart
+    controllers.join()
+
+    if metrics is not None:
+        print(metrics.toText())
+
+    maxRssMb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource is not None else None
+    return {
+        "output": {"changed": outputChanged, "frames": controllerResults["outputFrames"],
+                   "framesPerSec": controllerResults["outputFrames"] / args.duration,
+                   **latencySummary(controllerResults["outputLatencies"])},
+        "input": {"sent": controllerResults["inputSent"], "received": len(inputLatencies),
+                  "framesPerSec": len(inputLatencies) / args.duration, **latencySummary(inputLatencies)},
+        "cpuPercent": cpu / wall * 100,
+        "maxRssMb": maxRssMb,
+    }
+
+
+def formatMs(value) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def printResult(record: dict):
+    config, result = record["config"], record["result"]
+    out, inp = result["output"], result["input"]
+    print(f"commit={record['commit']}{'+' if record['dirty'] else ''} rate={config['rate']}/port "
+          f"fragment={config['fragment']} protocol={config['protocol']} duration={config['duration']}s")
+    print(f"  output  changed={out['changed']} frames={out['frames']} frames/s={out['framesPerSec']:,.0f} "
+          f"p50={formatMs(out['p50Ms'])}ms p99={formatMs(out['p99Ms'])}ms max={formatMs(out['maxMs'])}ms")
+    print(f"  input   sent={inp['sent']} received={inp['received']} frames/s={inp['framesPerSec']:,.0f} "
+          f"p50={formatMs(inp['p50Ms'])}ms p99={formatMs(inp['p99Ms'])}ms max={formatMs(inp['maxMs'])}ms")
+    rss = "-" if result["maxRssMb"] is None else f"{result['maxRssMb']:.0f}MB"
+    print(f"  process cpu={result['cpuPercent']:.0f}% maxRss={rss}")
+
+
+def printHistory():
+    if not os.path.exists(RESULTS_FILE):
+        print(f"No results in {RESULTS_FILE}")
+        return
+
+    print(f"{'time':<20}{'commit':<10}{'rate':>6}{'frag':>6}{'proto':>8}"
+          f"{'out/s':>9}{'out p50':>9}{'out p99':>9}{'in/s':>9}{'in p50':>9}{'in p99':>9}{'cpu%':>6}{'MB':>6}")
+    with open(RESULTS_FILE) as f:
+        for line in f:
+            record = json.loads(line)
+            config, result = record["config"], record["result"]
+            out, inp = result["output"], result["input"]
+            commit = f"{record['commit']}{'+' if record['dirty'] else ''}"
+            rss = "-" if result["maxRssMb"] is None else f"{result['maxRssMb']:.0f}"
+            print(f"{record['time'][:19]:<20}{commit:<10}{config['rate']:>6}{config['fragment']:>6}"
+                  f"{config['protocol']:>8}{out['framesPerSec']:>9,.0f}{formatMs(out['p50Ms']):>9}"
+                  f"{formatMs(out['p99Ms']):>9}{inp['framesPerSec']:>9,.0f}{formatMs(inp['p50Ms']):>9}"
+                  f"{formatMs(inp['p99Ms']):>9}{result['cpuPercent']:>6.0f}{rss:>6}")
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=1000, help="frames per second per port, 0 for unthrottled")
+    parser.add_argument("--duration", type=float, default=5, help="seconds of load")
+    parser.add_argument("--fragment", type=int, default=0, help="split input frames into writes of this size")
+    parser.add_argument("--protocol", choices=[PROTOCOL_JSON, PROTOCOL_BINARY], default=PROTOCOL_JSON)
+    parser.add_argument("--metrics", action="store_true", help="run with SignalMetrics enabled and print them")
+    parser.add_argument("--port-offset", type=int, default=0, help="move every port, to run beside the simulator")
+    parser.add_argument("--no-store", action="store_true", help="do not append the result to the results file")
+    parser.add_argument("--history", action="store_true", help="print the stored results and exit")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    benchArgs = parseArgs(sys.argv[1:])
+    if benchArgs.history:
+        printHistory()
+        sys.exit(0)
+
+    app = QCoreApplication(sys.argv[:1])
+    commit, dirty = getCommit()
+    benchRecord = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "config": {"rate": benchArgs.rate, "duration": benchArgs.duration, "fragment": benchArgs.fragment,
+                   "protocol": benchArgs.protocol, "metrics": benchArgs.metrics},
+        "result": runBenchmark(benchArgs),
+    }
+    printResult(benchRecord)
+
+    if not benchArgs.no_store:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a") as resultsFile:
+            resultsFile.write(json.dumps(benchRecord) + "\n")
+
+    sys.stdout.flush()
+    # the manager threads run for the lifetime of the process
+    os._exit(0)
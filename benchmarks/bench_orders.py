@@ -0,0 +1,68 @@
+"""
+Memory per order and snapshot save/load time of the order store in both snapshot formats.
+
+Run from the repository root:
+    python -m benchmarks.bench_orders [counts] [formats]
+    python -m benchmarks.bench_orders 10000,100000,1000000 json,compact
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from OrderPOS import Order, OrderJournal, OrderRecipe, OrderStatus
+
+STATUSES = [status.value for status in OrderStatus]
+
+
+def createOrders(count: int) -> list[Order]:
+    return [Order(orderId, f"order {orderId}", "cola with a fanta top", 500, 10,
+                  [OrderRecipe("cola", 350.0), OrderRecipe("fanta", 150.0)],
+                  STATUSES[orderId % len(STATUSES)], orderId % 10)
+            for orderId in range(1, count + 1)]
+
+
+def measureMemory(count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    orders = createOrders(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del orders
+    return size / count
+
+
+def benchFormat(orders: list[Order], snapshotFormat: str, directory: str):
+    journal = OrderJournal(os.path.join(directory, f"orders.{snapshotFormat}"),
+                           os.path.join(directory, f"orders.{snapshotFormat}.journal"), snapshotFormat)
+
+    start = time.perf_counter()
+    journal.writeSnapshot(orders, len(orders) + 1)
+    saveTime = time.perf_counter() - start
+    size = os.path.getsize(journal.snapshotPath)
+
+    start = time.perf_counter()
+    loaded, _ = journal.load()
+    loadTime = time.perf_counter() - start
+    assert len(loaded) == len(orders)
+
+    os.remove(journal.snapshotPath)
+    return saveTime, loadTime, size
+
+
+if __name__ == '__main__':
+    counts = [int(count) for count in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(",")]
+    formats = (sys.argv[2] if len(sys.argv) > 2 else
+               f"{OrderJournal.FORMAT_JSON},{OrderJournal.FORMAT_COMPACT}").split(",")
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for orderCount in counts:
+            print(f"orders={orderCount:,} memory={measureMemory(orderCount):.0f} bytes/order")
+            allOrders = createOrders(orderCount)
+            for formatName in formats:
+                save, load, fileSize = benchFormat(allOrders, formatName, tmpDir)
+                print(f"  {formatName:<8} save={save * 1000:,.0f}ms load={load * 1000:,.0f}ms "
+                      f"size={fileSize / orderCount:.0f} bytes/order")
+            del allOrders
@@ -0,0 +1,77 @@
+"""
+Send messages to InputSignalManager split at random byte boundaries and check none is lost.
+
+Run from the repository root:
+    python -m benchmarks.bench_recv_fragmentation [messages] [port]
+"""
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+from PySide6.QtCore import QCoreApplication, Qt
+
+from SysjSignal import InputSignal, InputSignalManager, SignalBase
+
+
+def buildStream(count):
+    rng = random.Random(704)
+    stream = bytearray()
+    for i in range(count):
+        stream += json.dumps({"name": f"sig{i % 50}", "cd": "BenchModel", "status": i % 2 == 0,
+                              "value": i}).encode()
+        stream += b"\n"
+
+    # random fragmentation, from single bytes up to several coalesced frames per write
+    chunks = []
+    pos = 0
+    while pos < len(stream):
+        size = rng.choice((1, rng.randint(2, 64), rng.randint(64, 4096)))
+        chunks.append(bytes(stream[pos:pos + size]))
+        pos += size
+    return chunks
+
+
+if __name__ == '__main__':
+    messageCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    benchPort = int(sys.argv[2]) if len(sys.argv) > 2 else 46000
+    app = QCoreApplication(sys.argv)
+
+    received = []
+    allReceived = threading.Event()
+
+    def onSignal(sig: SignalBase):
+        received.append(sig.value)
+        if len(received) == messageCount:
+            allReceived.set()
+
+    manager = InputSignalManager()
+    manager.recvSignal.connect(onSignal, Qt.ConnectionType.DirectConnection)
+    manager.addSignal(InputSignal("sig0", "BenchModel", benchPort))
+    manager.start()
+
+    chunks = buildStream(messageCount)
+    totalBytes = sum(len(chunk) for chunk in chunks)
+
+    while not manager.isSignalLive(InputSignal("sig0", "BenchModel", benchPort)):
+        time.sleep(0.001)
+    sender = socket.create_connection(("127.0.0.1", benchPort))
+    sender.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        sender.sendall(chunk)
+    allReceived.wait(timeout=60)
+    elapsed = time.perf_counter() - start
+    sender.close()
+
+    lost = messageCount - len(received)
+    inOrder = received == list(range(len(received)))
+    print(f"messages={messageCount} writes={len(chunks)} bytes={totalBytes} time={elapsed:.3f}s "
+          f"msg/s={len(received) / elapsed:,.0f} lost={lost} inOrder={inOrder}")
+
+    sys.stdout.flush()
+    os._exit(0 if lost == 0 and inOrder else 1)
@@ -0,0 +1,69 @@
+"""
+Measure the time from starting both signal managers until every signal is live.
+
+An output signal is live once its controller socket is connected, an input signal once its
+server socket is listening. Fake controllers listen on the output ports.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [basePort]
+"""
+import os
+import socket
+import sys
+import time
+
+from PySide6.QtCore import QCoreApplication
+
+from SysjSignal import InputSignal, InputSignalManager, OutputSignal, OutputSignalManager
+
+# endpoint count and signals per endpoint of the layout in main.Window
+OUTPUT_LAYOUT = [2, 4, 5, 5, 5, 5, 6, 1]
+INPUT_LAYOUT = [1, 2, 5, 5, 5, 5, 6, 1]
+
+
+def createSignals(basePort):
+    outputSignals = []
+    inputSignals = []
+    for i, count in enumerate(OUTPUT_LAYOUT):
+        outputSignals += [OutputSignal(f"out{i}_{j}", f"CD{i}", basePort + i) for j in range(count)]
+    for i, count in enumerate(INPUT_LAYOUT):
+        inputSignals += [InputSignal(f"in{i}_{j}", f"CD{i}", basePort + 1000 + i) for j in range(count)]
+    return outputSignals, inputSignals
+
+
+def startControllers(basePort):
+    listeners = []
+    for i in range(len(OUTPUT_LAYOUT)):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("127.0.0.1", basePort + i))
+        listener.listen(1)
+        listeners.append(listener)
+    return listeners
+
+
+if __name__ == '__main__':
+    benchBasePort = int(sys.argv[1]) if len(sys.argv) > 1 else 45000
+    app = QCoreApplication(sys.argv)
+
+    controllers = startControllers(benchBasePort)
+    oSignals, iSignals = createSignals(benchBasePort)
+
+    outputMngr = OutputSignalManager()
+    inputMngr = InputSignalManager()
+
+    start = time.perf_counter()
+    outputMngr.start()
+    inputMngr.start()
+    outputMngr.addSignals(oSignals)
+    inputMngr.addSignals(iSignals)
+
+    while not (all(outputMngr.isSignalLive(signal) for signal in oSignals) and
+               all(inputMngr.isSignalLive(signal) for signal in iSignals)):
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(oSignals)} output and {len(iSignals)} input signals live after {elapsed * 1000:.1f} ms")
+    # the manager threads never return
+    sys.stdout.flush()
+    os._exit(0)
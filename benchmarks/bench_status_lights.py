@@ -0,0 +1,59 @@
+"""
+Repaint cost of 1,000 status lights toggling, uncached svg icons against LabelStatusLight's cached path.
+
+Run from the repository root (add QT_QPA_PLATFORM=offscreen on a machine without a display):
+    python -m benchmarks.bench_status_lights [lights] [toggles]
+"""
+import sys
+import time
+
+from PySide6.QtWidgets import QApplication, QGridLayout, QWidget
+
+from MyIcon import MyFluentIcon as MIF
+from MyWidget import LabelStatusLight
+from SysjSignal import InputSignal
+
+
+def createLights(count):
+    container = QWidget()
+    layout = QGridLayout(container)
+    lights = [LabelStatusLight(InputSignal(f"sig{i}", "BenchModel", 0)) for i in range(count)]
+    for i, light in enumerate(lights):
+        layout.addWidget(light, i // 20, i % 20)
+    container.resize(4000, 2500)
+    container.show()
+    QApplication.processEvents()
+    return container, lights
+
+
+def uncachedToggle(light, status):
+    light.statusLight.setIcon(MIF.SL_GREEN if status else MIF.SL_GREY)
+
+
+def cachedToggle(light, status):
+    light.setStatus(status)
+
+
+def run(name, toggle, lightCount, toggles):
+    container, lights = createLights(lightCount)
+
+    start = time.perf_counter()
+    for i in range(toggles):
+        # every second update repeats the previous state, as repeated messages from a controller do
+        status = (i // 2) % 2 == 0
+        for light in lights:
+            toggle(light, status)
+        # paints only what was marked dirty
+        QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<9} lights={lightCount} updates={toggles} time={elapsed:.3f}s "
+          f"per update round={elapsed / toggles * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    benchLights = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    benchToggles = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    run("uncached", uncachedToggle, benchLights, benchToggles)
+    run("cached", cachedToggle, benchLights, benchToggles)
@@ -0,0 +1,159 @@
+"""
+Stand-ins for the SysJ controllers, used by the load benchmarks.
+
+ControllerListeners accept the connections of OutputSignalManager and time every frame they receive.
+ControllerSenders connect to the server sockets of InputSignalManager and send frames stamped with their
+send time. Both stamp with time.monotonic_ns(), which every process on the host shares.
+
+Run on its own to keep listeners up for the GUI or the headless runner:
+    python -m benchmarks.fake_controllers [basePort]
+"""
+import json
+import selectors
+import socket
+import sys
+import threading
+import time
+
+from SysjSignal import FrameReader, SignalProtocolError
+
+CONTROLLER_PORTS = list(range(40000, 40007))
+
+
+class ControllerListeners:
+    """ Accepts any number of connections on every port and drains them on one thread """
+
+    def __init__(self, ports: list[int]):
+        self.sel = selectors.DefaultSelector()
+        self.readers: dict[socket.socket, FrameReader] = {}
+        self.servSocks = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+        self.frames = 0
+        # ns from the stamp in the frame value to the frame being decoded here
+        self.latencies: list[int] = []
+
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("127.0.0.1", port))
+            sock.listen(10)
+            sock.setblocking(False)
+            self.servSocks.append(sock)
+            self.sel.register(sock, selectors.EVENT_READ, None)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        for sock in list(self.readers) + self.servSocks:
+            sock.close()
+
+    def run(self):
+        while not self.stopped.is_set():
+            for key, mask in self.sel.select(0.1):
+                if key.data is None:
+                    conn, _ = key.fileobj.accept()
+                    conn.setblocking(False)
+                    self.readers[conn] = FrameReader()
+                    self.sel.register(conn, selectors.EVENT_READ, conn)
+                else:
+                    self.readFrom(key.data)
+
+    def readFrom(self, conn: socket.socket):
+        try:
+            signals = self.readers[conn].readFrom(conn)
+        except (BlockingIOError, InterruptedError):
+            return
+        except (socket.error, SignalProtocolError):
+            signals = None
+
+        if signals is None:
+            self.sel.unregister(conn)
+            self.readers.pop(conn)
+            conn.close()
+            return
+
+        now = time.monotonic_ns()
+        self.frames += len(signals)
+        for sig in signals:
+            if isinstance(sig.value, int) and not isinstance(sig.value, bool):
+                self.latencies.append(now - sig.value)
+
+
+class ControllerSenders:
+    """ One connection per port, each sending rate frames per second split into fragment sized writes """
+
+    def __init__(self, targets: list[tuple[int, list[tuple[str, str]]]], rate: float, fragment: int = 0):
+        # (port, [(name, cd), ...]) of every server socket to send into
+        self.targets = targets
+        self.rate = rate
+        self.fragment = fragment
+        self.socks: list[socket.socket] = []
+        self.sent = 0
+
+    def connect(self, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        for port, _ in self.targets:
+            while True:
+                try:
+                    sock = socket.create_connection(("127.0.0.1", port))
+                    break
+                except ConnectionRefusedError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.01)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.socks.append(sock)
+
+    def close(self):
+        for sock in self.socks:
+            sock.close()
+
+    def send(self, sock: socket.socket, frame: bytes):
+        if self.fragment <= 0:
+            sock.sendall(frame)
+            return
+        for start in range(0, len(frame), self.fragment):
+            sock.sendall(frame[start:start + self.fragment])
+
+    def run(self, duration: float):
+        interval = 1 / self.rate if self.rate > 0 else 0
+        start = time.monotonic()
+        end = start + duration
+
+        tick = 0
+        while time.monotonic() < end:
+            for sock, (port, signals) in zip(self.socks, self.targets):
+                name, cd = signals[tick % len(signals)]
+                frame = json.dumps({"name": name, "cd": cd, "status": tick % 2 == 0,
+                                    "value": time.monotonic_ns()}).encode() + b"\n"
+                self.send(sock, frame)
+                self.sent += 1
+            tick += 1
+
+            if interval > 0:
+                wait = start + tick * interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+
+
+if __name__ == '__main__':
+    basePort = int(sys.argv[1]) if len(sys.argv) > 1 else CONTROLLER_PORTS[0]
+    listeners = ControllerListeners([basePort + i for i in range(len(CONTROLLER_PORTS))])
+    listeners.start()
+    print(f"Listening on {basePort}-{basePort + len(CONTROLLER_PORTS) - 1}, Ctrl+C to stop")
+
+    try:
+        lastFrames = 0
+        while True:
+            time.sleep(1)
+            print(f"frames/s={listeners.frames - lastFrames}")
+            lastFrames = listeners.frames
+    except KeyboardInterrupt:
+        listeners.stop()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import signal
+import sys
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, Slot, Signal
+
+from LineSignals import createLineStations, createPosSignals
+from SignalRecording import SignalRecorder
+from Simulation import SimulationScheduler, SequenceLibrary, PipelinedLineSimulation
+from SysjSignal import InputSignalManager, OutputSignalManager, SignalRegistry, SignalCoalescer, SignalMetrics, \
+    MetricsServer
+
+
+class HeadlessRunner(QObject):
+    """
+    The signals, sockets and simulation of the line without any widgets. Received triggers run their
+    station sequences like the GUI does, sequences given on the command line are run once everything is up.
+    """
+    sigPipelineReport = Signal(str)
+
+    def __init__(self, speed: float | None = 1.0, exitWhenIdle: bool = False, metricsPort: int | None = None,
+                 recordPath: str | None = None, parent=None):
+        super().__init__(parent)
+        self.exitWhenIdle = exitWhenIdle
+
+        self.outputSignalMngr = OutputSignalManager()
+        self.inputSignalMngr = InputSignalManager()
+        self.signalCoalescer = SignalCoalescer(33, self)
+        self.signalCoalescer.sigBatchReady.connect(self.dispatchSignals)
+        self.inputSignalMngr.setCoalescer(self.signalCoalescer)
+        self.signalRegistry = SignalRegistry()
+
+        self.metricsServer = None
+        if metricsPort is not None:
+            self.metrics = SignalMetrics()
+            self.outputSignalMngr.setMetrics(self.metrics)
+            self.inputSignalMngr.setMetrics(self.metrics)
+            self.metricsServer = MetricsServer(self.metrics, metricsPort)
+
+        self.recorder = None
+        if recordPath is not None:
+            self.recorder = SignalRecorder(recordPath)
+            self.outputSignalMngr.setRecorder(self.recorder)
+            self.inputSignalMngr.setRecorder(self.recorder)
+
+        self.simulationScheduler = SimulationScheduler(speed)
+        self.simulationScheduler.sigJobsChanged.connect(self.checkIdle)
+        self.sigPipelineReport.connect(self.printReport)
+
+        self.stations = createLineStations()
+        self.allOutputSignal = {}
+        for station in self.stations.values():
+            self.allOutputSignal[station.key] = station.oSig
+            self.outputSignalMngr.addSignals(station.oSig)
+            self.inputSignalMngr.addSignals(station.iSig)
+            if station.trigger is not None:
+                name, params = station.sequence
+                self.signalRegistry.addCallback(station.trigger,
+                                                lambda signals, n=name, p=params: self.simulateSequence(n, **p))
+
+        # there is no order list without the GUI, the POS progress is only logged
+        posSignal, posInputSignal = createPosSignals()
+        self.outputSignalMngr.addSignal(posSignal)
+        self.inputSignalMngr.addSignal(posInputSignal)
+
+        self.sequenceLibrary = SequenceLibrary.fromFile(self.allOutputSignal)
+
+    def start(self):
+        if self.metricsServer is not None:
+            self.metricsServer.start()
+        self.outputSignalMngr.start()
+        self.inputSignalMngr.start()
+        self.simulationScheduler.start()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def simulateSequence(self, name: str, **params):
+        sequence = self.sequenceLibrary.compile(name, **params)
+        self.simulationScheduler.submitCompiled(sequence, name + "".join(str(value) for value in params.values()))
+
+    def simulatePipelined(self, bottleCount: int):
+        pipeline = PipelinedLineSimulation(self.sequenceLibrary, bottleCount)
+        self.simulationScheduler.submitPipeline(pipeline, lambda p: self.sigPipelineReport.emit(p.getReportText()))
+
+    @Slot(list)
+    def dispatchSignals(self, batch: list):
+        for sb, trueCount in batch:
+            if sb.cd == 'POS':
+                self.printPosUpdate(sb.value)
+                continue
+            sigId = self.signalRegistry.idOf(sb.cd, sb.name)
+            if sigId is not None:
+                self.signalRegistry.runCallbacks(sigId, trueCount)
+
+    @staticmethod
+    def printPosUpdate(value):
+        try:
+            update = json.loads(value)
+            print(f"POS order {update['orderId']}: bottle {update['bottleIndex']} of {update['orderAmount']}")
+        except (TypeError, ValueError, KeyError):
+            print(f"Error: unreadable POS update {value!r}")
+
+    @Slot()
+    def checkIdle(self):
+        activeJobs, queuedJobs = self.simulationScheduler.getJobs()
+        if self.exitWhenIdle and len(activeJobs) == 0 and len(queuedJobs) == 0:
+            QCoreApplication.quit()
+
+    @Slot(str)
+    def printReport(self, text: str):
+        print(text)
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description="Runs the line simulator without the GUI.")
+    parser.add_argument("--sequence", action="append", default=[], metavar="NAME[:IDX]",
+                        help="run a sequence from res/sequences.json once started, e.g. line or filler:A")
+    parser.add_argument("--pipeline", type=int, metavar="BOTTLES",
+                        help="run the pipelined line with this many bottles and print its report")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="simulation speed relative to wall clock time, 0 for as fast as possible")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve signal I/O metrics on http://127.0.0.1:PORT/metrics and /metrics.json")
+    parser.add_argument("--record", metavar="PATH", help="log every signal transition to PATH for replay.py")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep running after the given sequences finished and react to triggers")
+    args = parser.parse_args(argv)
+    if args.speed < 0:
+        parser.error("--speed must not be negative")
+    return args
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    app = QCoreApplication(sys.argv[:1])
+
+    exitWhenIdle = not args.serve and (len(args.sequence) > 0 or args.pipeline is not None)
+    runner = HeadlessRunner(args.speed or None, exitWhenIdle, args.metrics_port, args.record)
+    runner.start()
+
+    for sequence in args.sequence:
+        name, _, idx = sequence.partition(":")
+        if idx:
+            runner.simulateSequence(name, idx=idx)
+        else:
+            runner.simulateSequence(name)
+    if args.pipeline is not None:
+        runner.simulatePipelined(args.pipeline)
+
+    # Python only handles Ctrl+C while the interpreter runs, so wake it up now and then
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    interruptTimer = QTimer()
+    interruptTimer.timeout.connect(lambda: None)
+    interruptTimer.start(200)
+
+    code = app.exec()
+    runner.close()
+    sys.stdout.flush()
+    # the manager threads run for the lifetime of the process
+    os._exit(code)
+
+
+if __name__ == '__main__':
+    main()
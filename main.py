@@ -1,98 +1,76 @@
+import functools
 import json
 import sys
 import threading
-import time
 
 from PySide6.QtGui import QIcon
-from PySide6.QtCore import Slot, Signal, QThread
+from PySide6.QtCore import Slot, Signal, QObject
 from PySide6.QtWidgets import QApplication, QLabel
 from qfluentwidgets import FluentWindow, NavigationItemPosition, ProgressBar
 
 from qfluentwidgets import FluentIcon as FIF
 
 from MyWidget import *
-from SysjSignal import OutputSignal, InputSignalManager, OutputSignalManager, SignalBase
+from Simulation import SimulationScheduler, SequenceLibrary, PipelinedLineSimulation
+from LineSignals import Station, createLineStations, createPosSignals, getBottlePosSignals
+from SysjSignal import OutputSignal, InputSignalManager, OutputSignalManager, SignalBase, SignalRegistry, \
+    SignalCoalescer
 
 
-class BottlePosCheckThread(QThread):
-    bottlePosChanged = Signal(int)
+class BottlePositionTracker(QObject):
+    # indices into bottlePosList of every position that currently holds a bottle
+    bottlePosChanged = Signal(list)
 
     def __init__(self, bottlePosList: list[OutputSignal]):
         super().__init__()
-        self.bottlePosList = bottlePosList
-
-    def run(self):
-        while True:
-            for i, bottlePos in enumerate(self.bottlePosList):
-                if bottlePos.status:
-                    self.bottlePosChanged.emit(i)
-                    break
+        self.lock = threading.Lock()
+        self.occupied = {i for i, bottlePos in enumerate(bottlePosList) if bottlePos.status}
+
+        for i, bottlePos in enumerate(bottlePosList):
+            bottlePos.emitter.sigStatusChanged.connect(functools.partial(self.updateSensor, i))
+
+    def updateSensor(self, posIdx: int, status: bool):
+        # sensors are changed from the simulator threads as well as the GUI
+        with self.lock:
+            if status == (posIdx in self.occupied):
+                return
+
+            if status:
+                self.occupied.add(posIdx)
             else:
-                self.bottlePosChanged.emit(-1)
-            time.sleep(0.5)
-
-
-def createFillerSignal(fillerIdx: str, iPort, oPort) -> tuple[list[OutputSignal], list[InputSignal], list]:
-    iSig = []
-    oSig = []
-
-    iSig.append(InputSignal(f"valveInjector{fillerIdx}OnOff", "FillerModel", iPort))
-    iSig.append(InputSignal(f"valveInlet{fillerIdx}OnOff", "FillerModel", iPort))
-    iSig.append(InputSignal(f"dosUnit{fillerIdx}ValveRetract", "FillerModel", iPort))
-    iSig.append(InputSignal(f"dosUnit{fillerIdx}ValveExtend", "FillerModel", iPort))
-    iSig.append(InputSignal(f"filler{fillerIdx}Idle", "Coordinator", iPort))
-
-    oSig.append(OutputSignal(f"bottleAtPos2{fillerIdx}", f"Filler{fillerIdx}ControllerCD", oPort))
-    oSig.append(OutputSignal(f"dosUnit{fillerIdx}Evac", f"Filler{fillerIdx}ControllerCD", oPort, initStatus=True))
-    oSig.append(OutputSignal(f"dosUnit{fillerIdx}AtTarget", f"Filler{fillerIdx}ControllerCD", oPort))
-    oSig.append(OutputSignal(f"bottleAtPos2{fillerIdx}Full", f"Filler{fillerIdx}ControllerCD", oPort))
-    oSig.append(OutputSignal(f"filler{fillerIdx}DoProcess", f"Filler{fillerIdx}ControllerCD", oPort,
-                             oneShot=True, ignoreSocket=True))
-
-    def fillerSimu(signals):
-        def simuThread():
-            signals[0].changeStatus(True)
-            time.sleep(1)
-            signals[1].changeStatus(False)
-            time.sleep(2)
-            signals[2].changeStatus(True)
-            time.sleep(1)
-            signals[2].changeStatus(False)
-            time.sleep(2)
-            signals[1].changeStatus(True)
-            time.sleep(1)
-            signals[0].changeStatus(False)
-
-        threading.Thread(target=simuThread).start()
-
-    simuEvent = [
-        None,
-        None,
-        None,
-        None,
-        (fillerSimu, oSig)
-    ]
-
-    return oSig, iSig, simuEvent
+                self.occupied.discard(posIdx)
+            positions = sorted(self.occupied)
+
+        self.bottlePosChanged.emit(positions)
+
+    def getPositions(self) -> list[int]:
+        with self.lock:
+            return sorted(self.occupied)
 
 
 class Window(FluentWindow):
+    sigPipelineReport = Signal(str)
 
     def __init__(self):
         super().__init__()
 
         self.outputSignalMngr = OutputSignalManager()
         self.inputSignalMngr = InputSignalManager()
-        self.inputSignalMngr.recvSignal.connect(self.updateStatusLight)
-        self.globalStatusLights = []
+        # received signals reach the GUI in batches at ~30 Hz
+        self.signalCoalescer = SignalCoalescer(33, self)
+        self.signalCoalescer.sigBatchReady.connect(self.updateStatusLights)
+        self.inputSignalMngr.setCoalescer(self.signalCoalescer)
+        self.signalRegistry = SignalRegistry()
 
-        self.inputSigCallbackMap: dict[str, tuple] = {}
         self.allOutputSignal: dict[str, list[OutputSignal]] = {}
 
+        # every simulated sequence runs on this one thread
+        self.simulationScheduler = SimulationScheduler()
+        self.simulationScheduler.sigJobsChanged.connect(self.updateSimulationJobs)
+
         # create sub interface
         self.posInterface = PosWidget(self)
-        posSignal = OutputSignal("POS", "POS", 50000, oneShot=True)
-        self.posInputSignal = InputSignal("POS", "POS", 51000)
+        posSignal, self.posInputSignal = createPosSignals()
         self.outputSignalMngr.addSignal(posSignal)
         self.inputSignalMngr.addSignal(self.posInputSignal)
         self.posInterface.setOutputSignal(posSignal)
@@ -110,9 +88,33 @@ class Window(FluentWindow):
         self.rotaryAndConveyorOverallLayout = QVBoxLayout()
         self.overallSimulatorButton = PushButton()
         self.overallSimulatorButton.setText('Simulate All')
-        self.overallSimulatorButton.clicked.connect(lambda: threading.Thread(target=self.simulatorAll).start())
+        self.overallSimulatorButton.clicked.connect(self.simulatorAll)
         self.rotaryAndConveyorOverallLayout.addWidget(self.overallSimulatorButton)
 
+        self.pipelineHBoxLayout = QHBoxLayout()
+        self.pipelineBottleSpinBox = CompactSpinBox()
+        self.pipelineBottleSpinBox.setRange(1, 1000)
+        self.pipelineBottleSpinBox.setValue(10)
+        self.pipelineHBoxLayout.addWidget(self.pipelineBottleSpinBox)
+        self.pipelineSimulatorButton = PushButton()
+        self.pipelineSimulatorButton.setText('Simulate Pipelined')
+        self.pipelineSimulatorButton.clicked.connect(self.simulatePipelined)
+        self.pipelineHBoxLayout.addWidget(self.pipelineSimulatorButton)
+        self.rotaryAndConveyorOverallLayout.addLayout(self.pipelineHBoxLayout)
+        self.pipelineReportLabel = QLabel()
+        self.pipelineReportLabel.setWordWrap(True)
+        self.rotaryAndConveyorOverallLayout.addWidget(self.pipelineReportLabel)
+        self.sigPipelineReport.connect(self.pipelineReportLabel.setText)
+
+        self.simulationJobsHBoxLayout = QHBoxLayout()
+        self.simulationJobsLabel = QLabel()
+        self.simulationJobsHBoxLayout.addWidget(self.simulationJobsLabel)
+        self.cancelSimulationButton = PushButton()
+        self.cancelSimulationButton.setText('Cancel Simulation')
+        self.cancelSimulationButton.clicked.connect(lambda: self.simulationScheduler.cancelAll())
+        self.simulationJobsHBoxLayout.addWidget(self.cancelSimulationButton)
+        self.rotaryAndConveyorOverallLayout.addLayout(self.simulationJobsHBoxLayout)
+
         self.bottlePosHBoxLayout = QHBoxLayout()
         self.bottlePosBar = ProgressBar()
         self.bottlePosBar.setRange(0, 7)
@@ -132,31 +134,32 @@ class Window(FluentWindow):
         self.initWindow()
         self.initInterfaces()
 
+        # station sequences are checked against the signals created above
+        self.sequenceLibrary = SequenceLibrary.fromFile(self.allOutputSignal)
+
         self.outputSignalMngr.start()
         self.inputSignalMngr.start()
+        self.simulationScheduler.start()
+        self.updateSimulationJobs()
 
-        self.bottlePosList.append(self.allOutputSignal['conveyor'][0])
-        self.bottlePosList.append(self.allOutputSignal['fillerA'][0])
-        self.bottlePosList.append(self.allOutputSignal['fillerB'][0])
-        self.bottlePosList.append(self.allOutputSignal['fillerC'][0])
-        self.bottlePosList.append(self.allOutputSignal['fillerD'][0])
-        self.bottlePosList.append(self.allOutputSignal['capper'][0])
-        self.bottlePosList.append(self.allOutputSignal['conveyor'][1])
+        self.bottlePosList.extend(getBottlePosSignals(self.stations))
 
-        self.bottlePosCheckThread = BottlePosCheckThread(self.bottlePosList)
-        self.bottlePosCheckThread.bottlePosChanged.connect(self.updateBottlePos)
-        self.bottlePosCheckThread.start()
+        self.bottlePositionTracker = BottlePositionTracker(self.bottlePosList)
+        self.bottlePositionTracker.bottlePosChanged.connect(self.updateBottlePos)
+        self.updateBottlePos(self.bottlePositionTracker.getPositions())
 
-    def updateBottlePos(self, bottlePos: int):
+    @Slot(list)
+    def updateBottlePos(self, positions: list):
         POS_STR = ['POS1', 'POS2A', 'POS2B', 'POS2C', 'POS2D', 'POS4', 'POS Left 5']
 
-        if bottlePos == -1:
+        if len(positions) == 0:
             if self.bottlePosBar.getVal() == 7:
                 self.bottlePosLabel.setText('Bottle Position: N/A')
                 self.bottlePosBar.setValue(0)
         else:
-            self.bottlePosLabel.setText(f'Bottle Position: {POS_STR[bottlePos]}')
-            self.bottlePosBar.setValue(bottlePos + 1)
+            self.bottlePosLabel.setText(f'Bottle Position: {", ".join(POS_STR[pos] for pos in positions)}')
+            # the bar follows the bottle furthest down the line
+            self.bottlePosBar.setValue(positions[-1] + 1)
 
     def initNavigation(self):
         self.navigationInterface.addSeparator()
@@ -193,159 +196,43 @@ class Window(FluentWindow):
         cdCard.addOutputSignals(oSig, simulatorEvent=simulatorEvent)
         lights = cdCard.addStatusLights(iSig)
 
-        for signal in oSig:
-            self.outputSignalMngr.addSignal(signal)
-        for signal in iSig:
-            self.inputSignalMngr.addSignal(signal)
-        for light in lights:
-            self.globalStatusLights.append(light)
+        self.outputSignalMngr.addSignals(oSig)
+        self.inputSignalMngr.addSignals(iSig)
+        for signal, light in zip(iSig, lights):
+            self.signalRegistry.bindLight(signal, light)
 
         return cdCard
 
-    def initRotaryAndConveyorInterface(self):
-        oSigRotary: list[OutputSignal] = [
-            OutputSignal("tableAlignedWithSensor", "RotaryTableControllerCD", 40001, initStatus=True),
-            OutputSignal("bottleAtPos5", "RotaryTableControllerCD", 40001),
-            OutputSignal("capOnBottleAtPos1", "RotaryTableControllerCD", 40001),
-            OutputSignal("move2NextPos", "RotaryTableControllerCD", 40001, oneShot=True, ignoreSocket=True),
-        ]
-
-        iSigRotary: list[InputSignal] = [
-            InputSignal("rotaryTableTrigger", "RotaryTableModel", 41001),
-            InputSignal("rotaryIdle", "Coordinator", 41001),
-        ]
-
-        def rotaryTriggerCallback(signals: list[OutputSignal]):
-            def simuThread():
-                signals[0].changeStatus(False)
-                time.sleep(1)
-                signals[0].changeStatus(True)
-
-            threading.Thread(target=simuThread).start()
-
-        self.inputSigCallbackMap['rotaryTableTrigger'] = (rotaryTriggerCallback, oSigRotary)
-        self.allOutputSignal['rotaryTable'] = oSigRotary
-
-        def rotarySimu(signals: list[OutputSignal]):
-            def simuThread():
-                signals[0].changeStatus(False)
-                time.sleep(1)
-                signals[0].changeStatus(True)
-
-            threading.Thread(target=simuThread).start()
-
-        simulatorEvent: list = [
-            None,
-            None,
-            None,
-            (rotarySimu, oSigRotary)
-        ]
-
-        rotaryCdCard = self.createCdCardByIOSignal(iSigRotary, oSigRotary, simulatorEvent=simulatorEvent)
-        self.rotaryAndConveyorInterface.addCdCard(rotaryCdCard)
-
-        oSigConveyor: list[OutputSignal] = [
-            OutputSignal("bottleAtPos1", "ConveyorControllerCD", 40000),
-            OutputSignal("bottleLeftPos5", "ConveyorControllerCD", 40000),
-        ]
-        iSigConveyor: list[InputSignal] = [
-            InputSignal("motConveyorOnOff", "ConveyorModel", 41000),
-        ]
-
-        self.allOutputSignal['conveyor'] = oSigConveyor
-
-        conveyorCdCard = self.createCdCardByIOSignal(iSigConveyor, oSigConveyor)
-        self.rotaryAndConveyorInterface.addCdCard(conveyorCdCard)
-
-    def initFillerABCDInterfaces(self):
-        oSigFillerA, iSigFillerA, eventA = createFillerSignal('A', 41002, 40002)
-        oSigFillerB, iSigFillerB, eventB = createFillerSignal('B', 41003, 40003)
-        oSigFillerC, iSigFillerC, eventC = createFillerSignal('C', 41004, 40004)
-        oSigFillerD, iSigFillerD, eventD = createFillerSignal('D', 41005, 40005)
-
-        self.allOutputSignal['fillerA'] = oSigFillerA
-        self.allOutputSignal['fillerB'] = oSigFillerB
-        self.allOutputSignal['fillerC'] = oSigFillerC
-        self.allOutputSignal['fillerD'] = oSigFillerD
-
-        fillerACdCard = self.createCdCardByIOSignal(iSigFillerA, oSigFillerA, simulatorEvent=eventA)
-        self.fillerAInterface.addCdCard(fillerACdCard)
-
-        fillerBCdCard = self.createCdCardByIOSignal(iSigFillerB, oSigFillerB, simulatorEvent=eventB)
-        self.fillerBInterface.addCdCard(fillerBCdCard)
-
-        fillerCCdCard = self.createCdCardByIOSignal(iSigFillerC, oSigFillerC, simulatorEvent=eventC)
-        self.fillerCInterface.addCdCard(fillerCCdCard)
-
-        fillerDCdCard = self.createCdCardByIOSignal(iSigFillerD, oSigFillerD, simulatorEvent=eventD)
-        self.fillerDInterface.addCdCard(fillerDCdCard)
-
-    def initCappeerInterface(self):
-        oSigCapper: list[OutputSignal] = [
-            OutputSignal("bottleAtPos4", "CapperControllerCD", 40006),
-            OutputSignal("gripperZAxisLowered", "CapperControllerCD", 40006),
-            OutputSignal("gripperZAxisLifted", "CapperControllerCD", 40006, initStatus=True),
-            OutputSignal("gripperTurnHomePos", "CapperControllerCD", 40006, initStatus=True),
-            OutputSignal("gripperTurnFinalPos", "CapperControllerCD", 40006),
-            OutputSignal("capperDoProcess", "CapperControllerCD", 40006, oneShot=True, ignoreSocket=True),
-        ]
-
-        iSigCapper: list[InputSignal] = [
-            InputSignal("cylPos5ZaxisExtend", "CapperModel", 41006),
-            InputSignal("gripperTurnRetract", "CapperModel", 41006),
-            InputSignal("gripperTurnExtend", "CapperModel", 41006),
-            InputSignal("capGripperPos5Extend", "CapperModel", 41006),
-            InputSignal("cylClampBottleExtend", "CapperModel", 41006),
-            InputSignal("capperIdle", "Coordinator", 41006),
-        ]
-
-        self.allOutputSignal['capper'] = oSigCapper
-
-        def capperSimu(signals: list[OutputSignal]):
-            def simuThread():
-                signals[0].changeStatus(True)
-                time.sleep(1)
-                signals[2].changeStatus(False)
-                time.sleep(1)
-                signals[1].changeStatus(True)
-                time.sleep(0.5)
-                signals[3].changeStatus(False)
-                time.sleep(1)
-                signals[4].changeStatus(True)
-                time.sleep(0.5)
-                signals[4].changeStatus(False)
-                time.sleep(0.5)
-                signals[3].changeStatus(True)
-                signals[1].changeStatus(False)
-                time.sleep(1)
-                signals[2].changeStatus(True)
-                signals[0].changeStatus(False)
-
-            threading.Thread(target=simuThread).start()
-
-        simulatorEvent: list = [
-            None,
-            None,
-            None,
-            None,
-            None,
-            (capperSimu, oSigCapper)
-        ]
-
-        capperCdCard = self.createCdCardByIOSignal(iSigCapper, oSigCapper, simulatorEvent=simulatorEvent)
-        self.capperInterface.addCdCard(capperCdCard)
+    def createCdCardByStation(self, station: Station):
+        self.allOutputSignal[station.key] = station.oSig
+        if station.trigger is not None:
+            name, params = station.sequence
+            self.signalRegistry.addCallback(station.trigger, lambda signals: self.simulateSequence(name, **params))
+
+        return self.createCdCardByIOSignal(station.iSig, station.oSig,
+                                           simulatorEvent=station.getSimulatorEvent(self.simulateSequence))
 
     def initInterfaces(self):
-        self.initRotaryAndConveyorInterface()
-        self.initFillerABCDInterfaces()
-        self.initCappeerInterface()
+        self.stations = createLineStations()
+
+        self.rotaryAndConveyorInterface.addCdCard(self.createCdCardByStation(self.stations['rotaryTable']))
+        self.rotaryAndConveyorInterface.addCdCard(self.createCdCardByStation(self.stations['conveyor']))
+        self.fillerAInterface.addCdCard(self.createCdCardByStation(self.stations['fillerA']))
+        self.fillerBInterface.addCdCard(self.createCdCardByStation(self.stations['fillerB']))
+        self.fillerCInterface.addCdCard(self.createCdCardByStation(self.stations['fillerC']))
+        self.fillerDInterface.addCdCard(self.createCdCardByStation(self.stations['fillerD']))
+        self.capperInterface.addCdCard(self.createCdCardByStation(self.stations['capper']))
+
+    @Slot(list)
+    def updateStatusLights(self, batch: list):
+        for sb, trueCount in batch:
+            self.updateStatusLight(sb, trueCount)
+
+    def updateStatusLight(self, sb: SignalBase, trueCount: int):
+        sigId = self.signalRegistry.idOf(sb.cd, sb.name)
 
-    @Slot(SignalBase)
-    def updateStatusLight(self, sb: SignalBase):
-        if sb.name in self.inputSigCallbackMap:
-            if sb.status:
-                callback, signals = self.inputSigCallbackMap[sb.name]
-                callback(signals)
+        if sigId is not None:
+            self.signalRegistry.runCallbacks(sigId, trueCount)
 
         if sb.cd == 'POS':
             updateOrderDtoDict = json.loads(sb.value)
@@ -354,73 +241,28 @@ class Window(FluentWindow):
             self.posInterface.updateOneOrder(updateOrderDto)
             return
 
-        for light in self.globalStatusLights:
-            if light.label.text() == sb.name:
-                light.setStatus(sb.status)
-                return
+        if sigId is not None and self.signalRegistry.lights[sigId] is not None:
+            self.signalRegistry.lights[sigId].setStatus(sb.status)
 
     def simulatorAll(self):
-        def fillerSimu(sigList: list[OutputSignal]):
-            sigList[0].changeStatus(True)
-            time.sleep(1)
-            sigList[1].changeStatus(False)
-            time.sleep(2)
-            sigList[2].changeStatus(True)
-            time.sleep(1)
-            sigList[2].changeStatus(False)
-            time.sleep(2)
-            sigList[1].changeStatus(True)
-            time.sleep(1)
-            sigList[0].changeStatus(False)
-
-        def capperSimu(sigList: list[OutputSignal]):
-            sigList[0].changeStatus(True)
-            time.sleep(1)
-            sigList[2].changeStatus(False)
-            time.sleep(1)
-            sigList[1].changeStatus(True)
-            time.sleep(0.5)
-            sigList[3].changeStatus(False)
-            time.sleep(1)
-            sigList[4].changeStatus(True)
-            time.sleep(0.5)
-            sigList[4].changeStatus(False)
-            time.sleep(0.5)
-            sigList[3].changeStatus(True)
-            sigList[1].changeStatus(False)
-            time.sleep(1)
-            sigList[2].changeStatus(True)
-            sigList[0].changeStatus(False)
-
-        def rotarySimu(sigList: list[OutputSignal]):
-            sigList[0].changeStatus(False)
-            time.sleep(1)
-            sigList[0].changeStatus(True)
-
-        # bottle At Pos1
-        self.allOutputSignal['conveyor'][0].changeStatus(False)
-        rotarySimu(self.allOutputSignal['rotaryTable'])
-        time.sleep(0.5)
-        fillerSimu(self.allOutputSignal['fillerA'])
-        time.sleep(0.5)
-        rotarySimu(self.allOutputSignal['rotaryTable'])
-        time.sleep(0.5)
-        fillerSimu(self.allOutputSignal['fillerB'])
-        time.sleep(0.5)
-        rotarySimu(self.allOutputSignal['rotaryTable'])
-        time.sleep(0.5)
-        fillerSimu(self.allOutputSignal['fillerC'])
-        time.sleep(0.5)
-        rotarySimu(self.allOutputSignal['rotaryTable'])
-        time.sleep(0.5)
-        fillerSimu(self.allOutputSignal['fillerD'])
-        time.sleep(0.5)
-        rotarySimu(self.allOutputSignal['rotaryTable'])
-        time.sleep(0.5)
-        capperSimu(self.allOutputSignal['capper'])
-        time.sleep(0.5)
-        rotarySimu(self.allOutputSignal['rotaryTable'])
-        self.allOutputSignal['conveyor'][1].changeStatus(True)
+        # the line drives every station, so it waits for and holds all of them
+        self.simulateSequence('line')
+
+    def simulatePipelined(self):
+        # one bottle on every table position, the report arrives from the scheduler thread
+        pipeline = PipelinedLineSimulation(self.sequenceLibrary, self.pipelineBottleSpinBox.value())
+        self.simulationScheduler.submitPipeline(pipeline, lambda p: self.sigPipelineReport.emit(p.getReportText()))
+
+    def simulateSequence(self, name: str, **params):
+        sequence = self.sequenceLibrary.compile(name, **params)
+        self.simulationScheduler.submitCompiled(sequence, name + "".join(str(value) for value in params.values()))
+
+    @Slot()
+    def updateSimulationJobs(self):
+        activeJobs, queuedJobs = self.simulationScheduler.getJobs()
+        active = ", ".join(job.name for job in activeJobs) or "-"
+        queued = ", ".join(job.name for job in queuedJobs) or "-"
+        self.simulationJobsLabel.setText(f'Running: {active}    Queued: {queued}')
 
 
 if __name__ == '__main__':
@@ -428,3 +270,5 @@ if __name__ == '__main__':
     w = Window()
     w.show()
     app.exec()
+    # the order writer thread still holds the changes of the last moments
+    w.posInterface.orderDao.close()
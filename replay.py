@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+from SignalRecording import SignalLog, RecordedState, DIRECTION_IN, DIRECTION_OUT
+from SysjSignal import OutputSignal, OutputSignalManager, SocketBaseInfo, FRAME_DELIMITER
+
+DIRECTIONS = {"in": {DIRECTION_IN}, "out": {DIRECTION_OUT}, "both": {DIRECTION_IN, DIRECTION_OUT}}
+
+
+class Replayer:
+    """
+    Feeds a recording back through the signal layer. Outbound frames go through an OutputSignalManager to the
+    controllers they were recorded for, one frame per recorded frame and in order. Inbound ones are sent to the
+    simulator's InputSignalManager ports like a controller would send them.
+    """
+    CONNECT_TIMEOUT = 10.0
+
+    def __init__(self, log: SignalLog, speed: float, directions: set[int]):
+        self.log = log
+        self.speed = speed
+        self.directions = directions
+
+        self.outputSignalMngr = OutputSignalManager()
+        self.outputSignals: dict[int, OutputSignal] = {}
+        # None for a port that refused the connection, its transitions are skipped
+        self.inputConns: dict[SocketBaseInfo, socket.socket | None] = {}
+        self.replayed = 0
+        self.skipped = 0
+
+    def getOutputSignal(self, state: RecordedState) -> OutputSignal:
+        signal = self.outputSignals.get(state.signal.sigId)
+        if signal is None:
+            info = state.signal.socketInfo
+            # ignoreSocket keeps the manager from sending states of its own, e.g. everything on connect,
+            # only the frames of the recording go out through enqueueFrame
+            signal = self.outputSignals[state.signal.sigId] = OutputSignal(state.signal.name, state.signal.cd,
+                                                                           info.port, info.ip, ignoreSocket=True)
+            self.outputSignalMngr.addSignal(signal)
+        return signal
+
+    def getInputConn(self, socketInfo: SocketBaseInfo) -> socket.socket | None:
+        if socketInfo not in self.inputConns:
+            try:
+                conn = socket.create_connection((socketInfo.ip, socketInfo.port), timeout=2)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except socket.error as e:
+                print(f"Error: {socketInfo.ip}:{socketInfo.port} {e}, skipping its signals")
+                conn = None
+            self.inputConns[socketInfo] = conn
+        return self.inputConns[socketInfo]
+
+    def connectOutputs(self):
+        """ Registers every outbound signal of the recording and waits for their endpoints """
+        for state in self.log:
+            if state.signal.direction == DIRECTION_OUT:
+                self.getOutputSignal(state)
+        self.outputSignalMngr.start()
+
+        deadline = time.monotonic() + self.CONNECT_TIMEOUT
+        signals = list(self.outputSignals.values())
+        while not all(self.outputSignalMngr.isSignalLive(signal) for signal in signals):
+            if time.monotonic() > deadline:
+                down = {f"{signal.socketInfo.ip}:{signal.socketInfo.port}" for signal in signals
+                        if not self.outputSignalMngr.isSignalLive(signal)}
+                print(f"Error: {', '.join(sorted(down))} not connected, skipping their signals")
+                break
+            time.sleep(0.01)
+
+    def replayState(self, state: RecordedState):
+        if state.signal.direction == DIRECTION_OUT:
+            signal = self.getOutputSignal(state)
+            if not self.outputSignalMngr.isSignalLive(signal):
+                self.skipped += 1
+                return
+            self.outputSignalMngr.enqueueFrame(signal, state.status, state.value)
+            self.replayed += 1
+            return
+
+        conn = self.getInputConn(state.signal.socketInfo)
+        if conn is None:
+            self.skipped += 1
+            return
+
+        frame = {"name": state.signal.name, "cd": state.signal.cd, "status": state.status}
+        if state.value is not None:
+            frame["value"] = state.value
+        try:
+            conn.sendall(json.dumps(frame).encode() + FRAME_DELIMITER)
+            self.replayed += 1
+        except socket.error as e:
+            print(f"Error: {e}")
+            conn.close()
+            self.inputConns[state.signal.socketInfo] = None
+            self.skipped += 1
+
+    def run(self):
+        if DIRECTION_OUT in self.directions:
+            self.connectOutputs()
+
+        wallStart = time.monotonic()
+        for state in self.log:
+            if state.signal.direction not in self.directions:
+                continue
+
+            if self.speed > 0:
+                wait = wallStart + state.timestamp / 1e9 / self.speed - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            self.replayState(state)
+
+        for conn in self.inputConns.values():
+            if conn is not None:
+                conn.close()
+        while self.outputSignalMngr.hasQueuedFrames():
+            time.sleep(0.01)
+        # give the manager a moment to flush the last batch
+        time.sleep(0.2)
+        return time.monotonic() - wallStart
+
+
+def scan(log: SignalLog):
+    counts: dict[tuple[int, str, str], int] = {}
+    first = last = None
+    total = 0
+    for state in log:
+        key = (state.signal.direction, state.signal.cd, state.signal.name)
+        counts[key] = counts.get(key, 0) + 1
+        if first is None:
+            first = state.timestamp
+        last = state.timestamp
+        total += 1
+
+    duration = (last - first) / 1e9 if total > 0 else 0.0
+    print(f"{total} transitions of {len(counts)} signals over {duration:.3f}s, "
+          f"{log.size} bytes, recorded at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(log.startTime))}")
+    for (direction, cd, name), count in sorted(counts.items()):
+        print(f"  {'out' if direction == DIRECTION_OUT else 'in ':<4}{cd}.{name}: {count}")
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description="Replays or scans a signal recording.")
+    parser.add_argument("path", help="recording written by headless.py --record")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 for as fast as possible")
+    parser.add_argument("--direction", choices=list(DIRECTIONS), default="both")
+    parser.add_argument("--scan", action="store_true", help="only print what the recording contains")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    log = SignalLog(args.path)
+
+    if args.scan:
+        scan(log)
+        log.close()
+        return
+
+    replayer = Replayer(log, args.speed, DIRECTIONS[args.direction])
+    elapsed = replayer.run()
+    log.close()
+
+    print(f"Replayed {replayer.replayed} transitions in {elapsed:.3f}s, skipped {replayer.skipped}")
+    sys.stdout.flush()
+    # the manager thread runs for the lifetime of the process
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()